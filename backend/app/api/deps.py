@@ -1,3 +1,5 @@
+import math
+from typing import Optional
 from fastapi import Depends, HTTPException, status, Request
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -6,31 +8,87 @@ from sqlalchemy.future import select
 from backend.app.core.config import settings
 from backend.app.core.database import get_db
 from backend.app.models.base import Agent
-from backend.app.schemas.auth import TokenData
+from backend.app.schemas.auth import AgentPrincipal, TokenData
+from backend.app.services.principal_cache import principal_cache
+from backend.app.services.rate_limit import RATE_LIMITS, parse_limit, rate_limiter
+from backend.app.core.security import normalize_mobile
 
-async def get_current_agent(
-    request: Request,
-    db: AsyncSession = Depends(get_db)
-) -> Agent:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-    )
-    
+def get_token_from_request(request: Request) -> Optional[str]:
+    """
+    Access token from the cookie, or the Authorization header (useful for Swagger).
+    """
     token_str = request.cookies.get("access_token")
     if not token_str:
-        # Check Authorization header as fallback (optional, useful for Swagger)
         auth_header = request.headers.get('Authorization')
         if auth_header and auth_header.startswith("Bearer "):
             token_str = auth_header
         else:
-            raise credentials_exception
+            return None
             
     # Strip "Bearer " if present
     if token_str.startswith("Bearer "):
-        token = token_str.split(" ")[1]
-    else:
-        token = token_str
+        return token_str.split(" ")[1]
+    return token_str
+
+def get_client_ip(request: Request) -> str:
+    if settings.TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            # Entries left of those our proxies appended are client-supplied;
+            # the one TRUSTED_PROXY_HOPS from the right is the address the
+            # outermost proxy actually saw.
+            hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+            if hops:
+                return hops[-min(max(settings.TRUSTED_PROXY_HOPS, 1), len(hops))]
+    return request.client.host if request.client else "unknown"
+
+def rate_limit(scope: str):
+    """
+    Dependency that answers 429 once a client IP or mobile number goes over
+    the scope's limit (see RATE_LIMITS), before the endpoint touches the DB.
+    """
+    ip_limit, mobile_limit = (parse_limit(spec) for spec in RATE_LIMITS[scope])
+
+    async def check(request: Request):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        keys = [(f"{scope}:ip:{get_client_ip(request)}", ip_limit)]
+        # FastAPI has already read the body; this is the cached copy
+        try:
+            body = await request.json()
+        except Exception:
+            body = None
+        if isinstance(body, dict) and isinstance(body.get("mobile"), str):
+            keys.append((f"{scope}:mobile:{normalize_mobile(body['mobile'])}", mobile_limit))
+
+        for key, (limit, window_seconds) in keys:
+            retry_after = await rate_limiter.hit(key, limit, window_seconds)
+            if retry_after is not None:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many attempts. Please try again later.",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+
+    return check
+
+async def get_current_agent(
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+) -> AgentPrincipal:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+    )
+    
+    token = get_token_from_request(request)
+    if not token:
+        raise credentials_exception
+
+    # Token already verified and resolved recently: no JWT decode, no DB
+    principal = principal_cache.get(token)
+    if principal:
+        return principal
 
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -41,11 +99,16 @@ async def get_current_agent(
     except JWTError:
         raise credentials_exception
     
-    result = await db.execute(select(Agent).where(Agent.agent_id == token_data.agent_id))
-    agent = result.scalars().first()
-    if agent is None:
+    result = await db.execute(
+        select(Agent.agent_id, Agent.name, Agent.mobile, Agent.is_verified)
+        .where(Agent.agent_id == token_data.agent_id)
+    )
+    row = result.first()
+    if row is None:
         raise credentials_exception
-    return agent
+    principal = AgentPrincipal.model_validate(row)
+    principal_cache.put(token, principal, payload.get("exp"))
+    return principal
 
 async def get_current_admin(request: Request):
     credentials_exception = HTTPException(
@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func
-from datetime import timedelta
+from datetime import date, timedelta
+from typing import Optional
 
 from backend.app.core.database import get_db
 from backend.app.core.config import settings
 from backend.app.core.security import create_access_token
 from backend.app.api.deps import get_current_admin
-from backend.app.schemas.admin import AdminLogin, SystemStats
+from backend.app.schemas.admin import AdminLogin, SystemStats, FollowupBackfill, FollowupScheduleIn
+from backend.app.schemas.investment import SchemeType
+from backend.app.services.followup_engine import backfill_followups
+from backend.app.services.followup_schedule import replan_followups, save_schedule
+from backend.app.services.pii_cache import pii_cache
+from backend.app.services.key_rotation import get_reencrypt_progress, reencrypt_customers
 from backend.app.schemas.auth import Token
 # ... other imports ...
 
@@ -73,3 +79,59 @@ async def get_system_stats(db: AsyncSession = Depends(get_db)):
         total_investment_value=float(total_value),
         pending_followups=pending_followups_count or 0
     )
+
+@router.post("/followups/backfill", status_code=202, dependencies=[Depends(get_current_admin)])
+async def trigger_followup_backfill(backfill_in: FollowupBackfill, background_tasks: BackgroundTasks):
+    if backfill_in.start_date > backfill_in.end_date:
+        raise HTTPException(status_code=400, detail="start_date must be on or before end_date")
+    if backfill_in.end_date > date.today():
+        raise HTTPException(status_code=400, detail="Cannot backfill future dates")
+
+    # Runs after the response; already-logged reminders are skipped
+    background_tasks.add_task(backfill_followups, backfill_in.start_date, backfill_in.end_date)
+    return {"message": f"Backfill queued for {backfill_in.start_date} to {backfill_in.end_date}"}
+
+@router.put("/followups/schedules", status_code=202, dependencies=[Depends(get_current_admin)])
+async def put_followup_schedule(
+    schedule_in: FollowupScheduleIn,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
+    # Stage codes (F<days>, P<days>) must fit investment.current_stage
+    if any(abs(offset) > 9999 for offset in schedule_in.offsets):
+        raise HTTPException(status_code=400, detail="Offsets must be within 9999 days of maturity")
+
+    schedule = await save_schedule(db, schedule_in.agent_id, schedule_in.scheme_type, schedule_in.name, schedule_in.offsets)
+    # Existing investments move to the new cadence after the response
+    background_tasks.add_task(replan_followups, schedule_in.agent_id, schedule_in.scheme_type)
+    return {"message": "Schedule saved, replanning follow-ups", "schedule_id": schedule.schedule_id}
+
+@router.post("/followups/replan", status_code=202, dependencies=[Depends(get_current_admin)])
+async def trigger_followup_replan(
+    background_tasks: BackgroundTasks,
+    agent_id: Optional[str] = None,
+    scheme_type: Optional[SchemeType] = None
+):
+    # After editing followup_schedule rows directly in the database
+    background_tasks.add_task(replan_followups, agent_id, scheme_type)
+    return {"message": "Replan queued"}
+
+@router.get("/pii-cache", dependencies=[Depends(get_current_admin)])
+async def get_pii_cache_stats():
+    # Per process: each web worker and the background worker have their own
+    return pii_cache.stats()
+
+@router.delete("/pii-cache", dependencies=[Depends(get_current_admin)])
+async def clear_pii_cache():
+    pii_cache.clear()
+    return {"message": "PII cache cleared"}
+
+@router.post("/encryption/reencrypt", status_code=202, dependencies=[Depends(get_current_admin)])
+async def trigger_reencryption(background_tasks: BackgroundTasks, restart: bool = False):
+    # Runs after the response, resuming from the saved cursor unless restart=true
+    background_tasks.add_task(reencrypt_customers, restart=restart)
+    return {"message": "Re-encryption queued"}
+
+@router.get("/encryption/reencrypt", dependencies=[Depends(get_current_admin)])
+async def read_reencryption_progress():
+    return await get_reencrypt_progress()
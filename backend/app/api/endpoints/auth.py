@@ -1,56 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from datetime import timedelta, datetime
 
 from backend.app.core.database import get_db
-from backend.app.core.security import verify_password, get_password_hash, create_access_token
+from backend.app.core.security import (
+    verify_password_async, get_password_hash_async, password_needs_rehash, create_access_token
+)
 from backend.app.core.config import settings
 from backend.app.models.base import Agent
 from backend.app.services.sms import sms_service
-from backend.app.schemas.auth import Token, AgentCreate, AgentLogin, AgentResponse, VerifyOTP, ResendOTP
-from backend.app.api.deps import get_current_agent
-import random
+from backend.app.schemas.auth import Token, AgentCreate, AgentLogin, AgentPrincipal, AgentResponse, VerifyOTP, ResendOTP
+from backend.app.api.deps import get_current_agent, get_token_from_request, rate_limit
+from backend.app.services.principal_cache import principal_cache
+from backend.app.services.otp import OtpResult, otp_store
 
 router = APIRouter()
 
-@router.post("/signup", response_model=None)
+@router.post("/signup", response_model=None, dependencies=[Depends(rate_limit("otp_send"))])
 async def signup(agent_in: AgentCreate, db: AsyncSession = Depends(get_db)):
     print(f"DEBUG: Signup request received for {agent_in.mobile}")
-    # Check if agent exists
-    result = await db.execute(select(Agent).where(Agent.mobile == agent_in.mobile))
-    agent = result.scalars().first()
-    print(f"DEBUG: Agent found in DB: {agent}")
-    if agent:
-        raise HTTPException(
-            status_code=400,
-            detail="Agent with this mobile number already registered",
-        )
-    
-    # Generate OTP
-    otp = str(random.randint(100000, 999999))
-    import datetime as dt # avoid local var conflict
-    expires_at = datetime.now() + timedelta(minutes=10)
-
-    # Create new agent
+    # Create new agent; uq_agent_mobile rejects an already registered number
     new_agent = Agent(
         name=agent_in.name,
         mobile=agent_in.mobile,
-        password_hash=get_password_hash(agent_in.password),
-        is_verified=False,
-        verification_code=otp,
-        verification_code_expires_at=expires_at
+        password_hash=await get_password_hash_async(agent_in.password),
+        is_verified=False
     )
     db.add(new_agent)
-    await db.commit()
-    await db.refresh(new_agent)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail="Agent with this mobile number already registered",
+        )
     
     # Send SMS
-    sms_service.send_verification_code(new_agent.mobile, otp)
+    otp = await otp_store.issue(agent_in.mobile)
+    sms_service.send_verification_code(agent_in.mobile, otp)
     
     return {"message": "Signup successful. Please verify OTP sent to your mobile."}
 
-@router.post("/verify", response_model=None)
+@router.post("/verify", response_model=None, dependencies=[Depends(rate_limit("otp_verify"))])
 async def verify_otp(verify_data: VerifyOTP, response: Response, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(Agent).where(Agent.mobile == verify_data.mobile))
     agent = result.scalars().first()
@@ -61,16 +55,16 @@ async def verify_otp(verify_data: VerifyOTP, response: Response, db: AsyncSessio
     if agent.is_verified:
          raise HTTPException(status_code=400, detail="Agent already verified")
 
-    if not agent.verification_code or agent.verification_code != verify_data.otp:
-        raise HTTPException(status_code=400, detail="Invalid OTP")
-        
-    if agent.verification_code_expires_at and datetime.now() > agent.verification_code_expires_at:
+    result = await otp_store.verify(verify_data.mobile, verify_data.otp)
+    if result == OtpResult.EXPIRED:
         raise HTTPException(status_code=400, detail="OTP Expired")
+    if result == OtpResult.TOO_MANY_ATTEMPTS:
+        raise HTTPException(status_code=400, detail="Too many wrong attempts. Please request a new OTP.")
+    if result != OtpResult.OK:
+        raise HTTPException(status_code=400, detail="Invalid OTP")
         
     # Success
     agent.is_verified = True
-    agent.verification_code = None
-    agent.verification_code_expires_at = None
     db.add(agent)
     await db.commit()
     await db.refresh(agent)
@@ -93,7 +87,7 @@ async def verify_otp(verify_data: VerifyOTP, response: Response, db: AsyncSessio
     
     return {"message": "Verification successful."}
 
-@router.post("/resend-otp", response_model=None)
+@router.post("/resend-otp", response_model=None, dependencies=[Depends(rate_limit("otp_send"))])
 async def resend_otp(resend_data: ResendOTP, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(Agent).where(Agent.mobile == resend_data.mobile))
     agent = result.scalars().first()
@@ -104,16 +98,8 @@ async def resend_otp(resend_data: ResendOTP, db: AsyncSession = Depends(get_db))
     if agent.is_verified:
         raise HTTPException(status_code=400, detail="Agent already verified")
 
-    # Generate new OTP
-    otp = str(random.randint(100000, 999999))
-    expires_at = datetime.now() + timedelta(minutes=10)
-    
-    agent.verification_code = otp
-    agent.verification_code = otp
-    agent.verification_code_expires_at = expires_at
-    db.add(agent)
-    await db.commit()
-    await db.refresh(agent)
+    # Generate new OTP (replaces the pending one)
+    otp = await otp_store.issue(agent.mobile)
     
     # Send SMS
     if sms_service.send_verification_code(agent.mobile, otp):
@@ -122,7 +108,7 @@ async def resend_otp(resend_data: ResendOTP, db: AsyncSession = Depends(get_db))
         # In mock mode (no creds), this will still return success printed to console
         return {"message": "OTP resent (Simulated). check console if no creds."}
 
-@router.post("/login", response_model=None)
+@router.post("/login", response_model=None, dependencies=[Depends(rate_limit("login"))])
 async def login(login_data: AgentLogin, response: Response, db: AsyncSession = Depends(get_db)):
     # Find agent
     result = await db.execute(select(Agent).where(Agent.mobile == login_data.mobile))
@@ -144,21 +130,32 @@ async def login(login_data: AgentLogin, response: Response, db: AsyncSession = D
         raise HTTPException(status_code=403, detail="Account not verified. Please verify OTP.")
 
     # Verify Password
-    if not verify_password(login_data.password, agent.password_hash):
+    if not await verify_password_async(login_data.password, agent.password_hash):
         # Increment failure count
         agent.failed_login_attempts = (agent.failed_login_attempts or 0) + 1
         
         if agent.failed_login_attempts >= 5:
             agent.locked_until = datetime.now() + timedelta(minutes=15)
+            # Existing sessions must re-authenticate against the DB
+            principal_cache.invalidate_agent(agent.agent_id)
         
         await db.commit() # Save failure count
         
         raise HTTPException(status_code=401, detail="Incorrect mobile or password")
     
     # Reset failures on success
+    changed = False
     if agent.failed_login_attempts > 0 or agent.locked_until:
         agent.failed_login_attempts = 0
         agent.locked_until = None
+        changed = True
+
+    # Upgrade the hash if BCRYPT_ROUNDS changed since it was made
+    if password_needs_rehash(agent.password_hash):
+        agent.password_hash = await get_password_hash_async(login_data.password)
+        changed = True
+
+    if changed:
         db.add(agent)
         await db.commit()
         await db.refresh(agent)
@@ -183,10 +180,13 @@ async def login(login_data: AgentLogin, response: Response, db: AsyncSession = D
     return {"message": "Login successful"}
 
 @router.post("/logout")
-async def logout(response: Response):
+async def logout(request: Request, response: Response):
+    token = get_token_from_request(request)
+    if token:
+        principal_cache.invalidate_token(token)
     response.delete_cookie(key="access_token")
     return {"message": "Logout successful"}
 
 @router.get("/me", response_model=AgentResponse)
-async def read_users_me(current_agent: Agent = Depends(get_current_agent)):
+async def read_users_me(current_agent: AgentPrincipal = Depends(get_current_agent)):
     return current_agent
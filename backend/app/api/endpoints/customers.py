@@ -1,34 +1,64 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.app.api import deps
 from backend.app.core.database import get_db
-from backend.app.models.base import Agent
-from backend.app.schemas.customer import CustomerCreate, CustomerResponse
+from backend.app.schemas.auth import AgentPrincipal
+from backend.app.core.pagination import NEXT_CURSOR_HEADER
+from backend.app.schemas.customer import CustomerCreate, CustomerResponse, CustomerSort
 from backend.app.services import customer_service
 
 router = APIRouter()
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
 @router.post("/", response_model=CustomerResponse)
 async def create_customer(
     customer_in: CustomerCreate,
-    current_agent: Agent = Depends(deps.get_current_agent),
+    current_agent: AgentPrincipal = Depends(deps.get_current_agent),
     db: AsyncSession = Depends(get_db)
 ):
     return await customer_service.create_new_customer(db, customer_in, current_agent.agent_id)
 
 @router.get("/", response_model=List[CustomerResponse])
 async def read_customers(
-    current_agent: Agent = Depends(deps.get_current_agent),
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: CustomerSort = CustomerSort.OLDEST_FIRST,
+    current_agent: AgentPrincipal = Depends(deps.get_current_agent),
+    db: AsyncSession = Depends(get_db)
+):
+    # Without limit/cursor: the whole book, as before
+    if limit is None and cursor is None:
+        return await customer_service.list_agent_customers(db, current_agent.agent_id)
+
+    try:
+        customers, next_cursor = await customer_service.list_agent_customers_page(
+            db, current_agent.agent_id, limit or DEFAULT_PAGE_SIZE, cursor, sort
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return customers
+
+# Declared before /{customer_id} so "search" isn't taken for an id
+@router.get("/search", response_model=List[CustomerResponse])
+async def search_customers(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(50, ge=1, le=200),
+    current_agent: AgentPrincipal = Depends(deps.get_current_agent),
     db: AsyncSession = Depends(get_db)
 ):
-    return await customer_service.list_agent_customers(db, current_agent.agent_id)
+    return await customer_service.search_customers(db, current_agent.agent_id, q, limit)
 
 @router.get("/{customer_id}", response_model=CustomerResponse)
 async def read_customer(
     customer_id: str,
-    current_agent: Agent = Depends(deps.get_current_agent),
+    current_agent: AgentPrincipal = Depends(deps.get_current_agent),
     db: AsyncSession = Depends(get_db)
 ):
     customer = await customer_service.get_customer_by_id(db, customer_id)
@@ -6,14 +6,15 @@ from sqlalchemy import func
 from backend.app.core.database import get_db
 from backend.app.api.deps import get_current_agent
 from backend.app.schemas.admin import SystemStats # Reusing schema as structure is same
-from backend.app.models.base import Agent, Customer, Investment, FollowupLog
+from backend.app.models.base import Customer, Investment, FollowupLog
+from backend.app.schemas.auth import AgentPrincipal
 
 router = APIRouter()
 
 @router.get("/stats", response_model=SystemStats)
 async def get_dashboard_stats(
     db: AsyncSession = Depends(get_db),
-    current_agent: Agent = Depends(get_current_agent)
+    current_agent: AgentPrincipal = Depends(get_current_agent)
 ):
     # Filter by Current Agent
     
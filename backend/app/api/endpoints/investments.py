@@ -1,54 +1,75 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.app.api import deps
 from backend.app.core.database import get_db
-from backend.app.models.base import Agent
-from backend.app.schemas.investment import InvestmentCreate, InvestmentResponse
+from backend.app.schemas.auth import AgentPrincipal
+from backend.app.core.pagination import NEXT_CURSOR_HEADER
+from backend.app.schemas.investment import InvestmentCreate, InvestmentResponse, InvestmentStatus, SchemeType
 from backend.app.services import investment_service, customer_service
 
 router = APIRouter()
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
 @router.post("/", response_model=InvestmentResponse)
 async def create_investment(
     investment_in: InvestmentCreate,
-    current_agent: Agent = Depends(deps.get_current_agent),
+    current_agent: AgentPrincipal = Depends(deps.get_current_agent),
     db: AsyncSession = Depends(get_db)
 ):
     # Verify customer belongs to agent
-    customer = await customer_service.get_customer_by_id(db, investment_in.customer_id)
-    if not customer:
+    owner_id = await customer_service.get_customer_owner(db, investment_in.customer_id)
+    if not owner_id:
         raise HTTPException(status_code=404, detail="Customer not found")
-    if customer.agent_id != current_agent.agent_id:
+    if owner_id != current_agent.agent_id:
         raise HTTPException(status_code=400, detail="Not enough permissions")
         
-    return await investment_service.create_investment(db, investment_in)
+    return await investment_service.create_investment(db, investment_in, current_agent.agent_id)
 
 @router.get("/", response_model=List[InvestmentResponse])
 async def read_investments(
+    response: Response,
     customer_id: str = None,
-    current_agent: Agent = Depends(deps.get_current_agent),
+    status: Optional[InvestmentStatus] = None,
+    scheme_type: Optional[SchemeType] = None,
+    maturity_from: Optional[date] = None,
+    maturity_to: Optional[date] = None,
+    stage: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_agent: AgentPrincipal = Depends(deps.get_current_agent),
     db: AsyncSession = Depends(get_db)
 ):
     # If customer_id provided, fetch only for that customer (after verifying ownership)
     if customer_id:
-        customer = await customer_service.get_customer_by_id(db, customer_id)
-        if not customer:
+        owner_id = await customer_service.get_customer_owner(db, customer_id)
+        if not owner_id:
             raise HTTPException(status_code=404, detail="Customer not found")
-        if customer.agent_id != current_agent.agent_id:
+        if owner_id != current_agent.agent_id:
             raise HTTPException(status_code=400, detail="Not enough permissions")
-            
-        return await investment_service.list_investments(db, customer_id=customer_id)
 
-    # Get all customers of agent
-    customers = await customer_service.list_agent_customers(db, current_agent.agent_id)
-    customer_ids = [c.customer_id for c in customers]
-    
-    # Now get investments for these customers
-    all_investments = []
-    for cid in customer_ids:
-        invs = await investment_service.list_investments(db, customer_id=cid)
-        all_investments.extend(invs)
-        
-    return all_investments
+    # A cursor alone pages at the default size; neither returns every match, as before
+    if limit is None and cursor is not None:
+        limit = DEFAULT_PAGE_SIZE
+    try:
+        investments, next_cursor = await investment_service.list_agent_investments(
+            db,
+            current_agent.agent_id,
+            customer_id=customer_id,
+            status=status,
+            scheme_type=scheme_type,
+            maturity_from=maturity_from,
+            maturity_to=maturity_to,
+            stage=stage,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return investments
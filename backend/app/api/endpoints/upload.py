@@ -5,10 +5,11 @@ from io import BytesIO
 
 from backend.app.api import deps
 from backend.app.core.database import get_db
-from backend.app.models.base import Agent
+from backend.app.schemas.auth import AgentPrincipal
 from backend.app.schemas.customer import CustomerCreate
 from backend.app.schemas.investment import InvestmentCreate, SchemeType, InvestmentStatus
 from backend.app.services import customer_service, investment_service
+from backend.app.services.followup_schedule import load_schedules
 from datetime import datetime
 
 router = APIRouter()
@@ -16,7 +17,7 @@ router = APIRouter()
 @router.post("/bulk", status_code=201)
 async def bulk_upload(
     file: UploadFile = File(...),
-    current_agent: Agent = Depends(deps.get_current_agent),
+    current_agent: AgentPrincipal = Depends(deps.get_current_agent),
     db: AsyncSession = Depends(get_db)
 ):
     if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
@@ -36,11 +37,16 @@ async def bulk_upload(
     if not all(col in df.columns for col in required_cols):
         raise HTTPException(status_code=400, detail=f"Missing columns. Required: {required_cols}")
 
-    # Get existing customers to deduplicate (by mobile)
-    # Note: Optimization needed for large scale, but fine for MVP
-    # We decrypt all agent's customers to check mobile numbers
-    existing_customers = await customer_service.list_agent_customers(db, current_agent.agent_id)
-    mobile_map = {c.mobile: c.customer_id for c in existing_customers} # mobile is already decrypted in list_agent_customers
+    # Shared by every row below
+    agent_id = current_agent.agent_id
+
+    # Existing customers to deduplicate against (by mobile), via the blind index
+    mobile_map = await customer_service.find_customer_ids_by_mobile(
+        db, agent_id, {str(mobile) for mobile in df['Mobile']}
+    )
+
+    # Follow-up schedules are compiled once for the whole file
+    schedules = await load_schedules(db, agent_ids=[agent_id])
 
     count_new_cust = 0
     count_inv = 0
@@ -55,7 +61,7 @@ async def bulk_upload(
                 customer_id = mobile_map[mobile]
             else:
                 cust_in = CustomerCreate(full_name=name, mobile=mobile, consent_flag=False)
-                new_cust = await customer_service.create_new_customer(db, cust_in, current_agent.agent_id)
+                new_cust = await customer_service.create_new_customer(db, cust_in, agent_id)
                 customer_id = new_cust.customer_id
                 mobile_map[mobile] = customer_id # Cache it
                 count_new_cust += 1
@@ -79,7 +85,7 @@ async def bulk_upload(
                 maturity_date=mat_date,
                 status=InvestmentStatus.ACTIVE
             )
-            await investment_service.create_investment(db, inv_in)
+            await investment_service.create_investment(db, inv_in, agent_id, schedules=schedules)
             count_inv += 1
             
         except Exception as e:
@@ -16,6 +16,9 @@ class Settings(BaseSettings):
     DB_PORT: int
     DB_NAME: str
     DB_SSL: bool = True
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    WORKER_DB_POOL_SIZE: int = 3 # Background worker process (backend.app.worker)
 
     @computed_field
     @property
@@ -37,8 +40,60 @@ class Settings(BaseSettings):
         # Actually, let's just use the Pydantic Settings way.
         return self.SECRET_KEY
 
+    # Authenticated-agent cache (per process; logout/lockout invalidate only the local process)
+    AUTH_CACHE_ENABLED: bool = True
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+
+    # Auth rate limits ("requests/seconds", sliding window, checked before any DB work)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory" # "memory" (per process) or "redis" (shared; needs the redis package)
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+    RATE_LIMIT_MAX_KEYS: int = 100000 # Memory backend: least recently seen keys are dropped beyond this
+    RATE_LIMIT_LOGIN_PER_IP: str = "20/60"
+    RATE_LIMIT_LOGIN_PER_MOBILE: str = "5/60"
+    RATE_LIMIT_OTP_SEND_PER_IP: str = "10/600" # signup, resend-otp
+    RATE_LIMIT_OTP_SEND_PER_MOBILE: str = "3/600"
+    RATE_LIMIT_OTP_VERIFY_PER_IP: str = "20/600"
+    RATE_LIMIT_OTP_VERIFY_PER_MOBILE: str = "5/600"
+    # Take the client IP from X-Forwarded-For. Leave False only when clients
+    # connect directly: behind a router (e.g. the Procfile's platform router)
+    # every request comes from the proxy's IP, so all clients share one
+    # per-IP limit.
+    TRUST_PROXY_HEADERS: bool = False
+    TRUSTED_PROXY_HOPS: int = 1 # Proxies in front of the app; each appends the address it saw to X-Forwarded-For
+
+    # OTP verification codes
+    OTP_STORE: str = "memory" # "memory" (single web process) or "db" (otp table, shared)
+    OTP_TTL_SECONDS: int = 600
+    OTP_MAX_ATTEMPTS: int = 5 # Wrong guesses before the code is discarded
+    OTP_LENGTH: int = 6
+    OTP_PURGE_MINUTES: int = 30 # "db" store: how often expired rows are deleted
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12 # Cost factor; existing hashes are upgraded on the next login
+    PASSWORD_HASH_WORKERS: int = 2 # Threads for bcrypt, off the event loop
+
     # Field Encryption (AES-256)
+    # Key 0: reads every pre-rotation ciphertext. Unless BLIND_INDEX_KEY is
+    # set it also derives the blind index key, so it must stay configured
+    # even after re-encryption has moved every ciphertext off it.
     ENCRYPTION_KEY: str
+    ENCRYPTION_KEYRING: Optional[str] = None # Extra keys as "1:<b64 key>,2:<b64 key>"
+    ENCRYPTION_ACTIVE_KEY_ID: int = 0 # Key used for new ciphertexts
+    REENCRYPT_BATCH_SIZE: int = 500 # Rows per committed re-encryption batch
+    REENCRYPT_PAUSE_SECONDS: float = 0.5 # Sleep between batches to keep DB load low
+    DECRYPT_WORKERS: int = 4 # Threads for large decrypt_many batches
+    DECRYPT_PARALLEL_THRESHOLD: int = 2000 # Smaller batches decrypt inline
+    BLIND_INDEX_KEY: Optional[str] = None # HMAC key for searchable hashes; derived from ENCRYPTION_KEY if unset; changing it orphans every stored hash
+    NAME_SEARCH_MIN_PREFIX: int = 2 # Shortest name prefix that is indexed / searchable
+    NAME_SEARCH_MAX_PREFIX: int = 12 # Longer words are indexed (and searched) by their first N characters
+
+    # Decrypted PII cache (per process; disable where plaintext must not linger in memory)
+    PII_CACHE_ENABLED: bool = True
+    PII_CACHE_TTL_SECONDS: int = 300
+    PII_CACHE_MAX_ENTRIES: int = 10000
+    PII_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
     
     # Admin
     ADMIN_SECRET: Optional[str] = None
@@ -47,10 +102,31 @@ class Settings(BaseSettings):
     WHATSAPP_TOKEN: Optional[str] = None
     WHATSAPP_PHONE_ID: Optional[str] = None
 
+    # Scheduler
+    WEB_RUN_SCHEDULER: bool = False # Jobs run in the worker process; enable for single-process dev setups
+    SCHEDULER_LEASE_TTL_SECONDS: int = 120 # Leader must renew within this window
+    SCHEDULER_LEASE_RENEW_SECONDS: int = 30
+    FOLLOWUP_RUN_ON_STARTUP: bool = False # Also run the scan once at boot (dev/verification)
+
+    # Follow-up Engine
+    FOLLOWUP_SCAN_CHUNK_SIZE: int = 500 # Rows per committed chunk; 0 = whole scan in one transaction
+    FOLLOWUP_DIGEST_MODE: bool = False # Group each agent's due reminders into digest SMS
+    FOLLOWUP_DIGEST_MAX_CHARS: int = 459 # 3 concatenated SMS segments
+
+    # Notification Outbox (delivery worker)
+    OUTBOX_POLL_SECONDS: int = 30
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_LEASE_SECONDS: int = 300 # Claimed rows go back to the queue if not recorded by then
+    OUTBOX_MAX_ATTEMPTS: int = 5 # Then the row is dead-lettered
+    OUTBOX_BACKOFF_SECONDS: int = 60 # Doubles after every failed attempt
+    OUTBOX_MAX_BACKOFF_SECONDS: int = 3600
+    OUTBOX_RETENTION_DAYS: int = 30 # SENT and DEAD rows are deleted after this
+
     # Twilio
     TWILIO_ACCOUNT_SID: Optional[str] = None
     TWILIO_AUTH_TOKEN: Optional[str] = None
     TWILIO_FROM_NUMBER: Optional[str] = None
+    SMS_DISPATCH_CONCURRENCY: int = 8 # Parallel Twilio calls from async jobs
 
     model_config = SettingsConfigDict(
         env_file=".env", 
@@ -12,12 +12,20 @@ if settings.DB_SSL:
     ctx.verify_mode = ssl.CERT_NONE
     connect_args['ssl'] = ctx
 
-engine = create_async_engine(
-    settings.SQLALCHEMY_DATABASE_URI,
-    pool_recycle=1800,
-    pool_pre_ping=True,
-    connect_args=connect_args
-)
+def build_engine(pool_size: int, max_overflow: int):
+    return create_async_engine(
+        settings.SQLALCHEMY_DATABASE_URI,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        connect_args=connect_args
+    )
+
+# The one engine per process, sized when this module is first imported.
+# Processes needing another pool size (backend.app.worker) adjust the
+# settings before importing anything that imports this module.
+engine = build_engine(settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
 
 SessionLocal = async_sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AsyncSession)
 
@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List
+
+from sqlalchemy import and_, or_, tuple_
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Opaque keyset cursor: the sort key of the last row on a page.
+    Dates are tagged so they round-trip through JSON; None stays null.
+    """
+    payload = [
+        {"dt": value.isoformat()} if isinstance(value, datetime)
+        else {"d": value.isoformat()} if isinstance(value, date)
+        else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Inverse of encode_cursor; raises ValueError if the cursor is malformed
+    or doesn't hold `size` values.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(payload, list) or len(payload) != size:
+        raise ValueError("Invalid cursor")
+    values = []
+    for value in payload:
+        if isinstance(value, dict) and "dt" in value:
+            value = datetime.fromisoformat(value["dt"])
+        elif isinstance(value, dict) and "d" in value:
+            value = date.fromisoformat(value["d"])
+        values.append(value)
+    return values
+
+def keyset_after(column, tiebreaker, after: List[Any], descending: bool = False):
+    """
+    WHERE clause for the rows following `after` = [column value, tiebreaker
+    value] in (column, tiebreaker) order. `column` may be NULL: NULLs sort
+    lowest (as in MySQL), so they come first ascending and last descending,
+    and a cursor whose column value is None is valid.
+    """
+    value, key = after
+    if value is None:
+        if descending:
+            return and_(column.is_(None), tiebreaker < key)
+        return or_(column.isnot(None), tiebreaker > key)
+    if descending:
+        return or_(tuple_(column, tiebreaker) < tuple_(value, key), column.is_(None))
+    return tuple_(column, tiebreaker) > tuple_(value, key)
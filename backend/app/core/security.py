@@ -1,30 +1,72 @@
+import asyncio
 import base64
+import hashlib
+import hmac
 import os
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union
+from typing import Any, List, Optional, Sequence, Set, Union
 
 from jose import jwt
 import bcrypt  # Use direct bcrypt instead of passlib
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from backend.app.core.config import settings
 
 # AES-256 Encryption Setup
-# Ensure key is valid 32 bytes
-try:
-    # If key is base64 encoded in env
-    ENCRYPTION_KEY_BYTES = base64.urlsafe_b64decode(settings.ENCRYPTION_KEY)
-except Exception:
-    # Fallback if it's a raw string (needs to be 32 chars/bytes for AES-256)
-    # This is a fallback for dev, strictly should be base64 32 bytes.
-    # We pad or truncate to 32 bytes for safety in dev (NOT PROD SAFE but avoids crash)
-    key_str = settings.ENCRYPTION_KEY
-    ENCRYPTION_KEY_BYTES = key_str.encode()[:32].ljust(32, b'0')
-
-if len(ENCRYPTION_KEY_BYTES) != 32:
-    # If still not 32, force generation (ephemeral, data loss on restart if used)
-    print("WARNING: ENCRYPTION_KEY is not 32 bytes. Using ephemeral key.")
-    ENCRYPTION_KEY_BYTES = os.urandom(32)
+def _parse_key(value: str, name: str) -> bytes:
+    """
+    A 32-byte key given base64-encoded (preferred) or as a raw 32-character string.
+    Anything else is a configuration error: encrypting with a wrong or random
+    key would make stored data unreadable.
+    """
+    try:
+        key = base64.urlsafe_b64decode(value)
+        if len(key) == 32:
+            return key
+    except Exception:
+        pass
+    if len(value.encode()) == 32:
+        return value.encode()
+    raise ValueError(f"{name} must be a 32-byte key, base64-encoded")
+
+ENCRYPTION_KEY_BYTES = _parse_key(settings.ENCRYPTION_KEY, "ENCRYPTION_KEY")
+
+# Keyring: ENCRYPTION_KEY is key 0 (the key of every pre-rotation ciphertext),
+# ENCRYPTION_KEYRING adds "id:key" pairs. AESGCM objects are built once and
+# are stateless, so they are safe to share across threads.
+_keyring = {0: AESGCM(ENCRYPTION_KEY_BYTES)}
+for _entry in filter(None, (part.strip() for part in (settings.ENCRYPTION_KEYRING or "").split(","))):
+    _key_id, _, _key_value = _entry.partition(":")
+    if not _key_id.isdigit() or not 1 <= int(_key_id) <= 255:
+        raise ValueError(f"ENCRYPTION_KEYRING ids must be 1-255, got {_key_id!r}")
+    _keyring[int(_key_id)] = AESGCM(_parse_key(_key_value, f"ENCRYPTION_KEYRING key {_key_id}"))
+
+ACTIVE_KEY_ID = settings.ENCRYPTION_ACTIVE_KEY_ID
+if ACTIVE_KEY_ID not in _keyring:
+    raise ValueError(f"ENCRYPTION_ACTIVE_KEY_ID {ACTIVE_KEY_ID} is not in the keyring")
+
+GCM_NONCE_SIZE = 12
+GCM_TAG_SIZE = 16
+
+# Leading byte of the binary formats. Legacy values are ASCII base64, which
+# never starts with 0x01/0x02, so all formats can share a column.
+FIELD_FORMAT_V1 = 0x01 # VERSION + NONCE + CIPHERTEXT+TAG, always key 0
+FIELD_FORMAT_V2 = 0x02 # VERSION + KEY_ID + NONCE + CIPHERTEXT+TAG
+
+# Blind indexes use their own key so a leaked index can't be tested against the cipher key.
+# The derived one ties them to ENCRYPTION_KEY, which therefore can never be removed.
+if settings.BLIND_INDEX_KEY:
+    BLIND_INDEX_KEY_BYTES = settings.BLIND_INDEX_KEY.encode()
+else:
+    BLIND_INDEX_KEY_BYTES = hmac.new(ENCRYPTION_KEY_BYTES, b"blind-index", hashlib.sha256).digest()
+
+# Created on first large batch; `cryptography` releases the GIL while decrypting
+_decrypt_pool: Optional[ThreadPoolExecutor] = None
+
+# bcrypt also releases the GIL; a small pool caps how many cores password work can take
+_password_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -32,7 +74,29 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 
 def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)).decode('utf-8')
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    verify_password on the bcrypt pool, so the event loop keeps serving requests.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_password_pool, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_password_pool, get_password_hash, password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    True when a hash was made with a different cost than BCRYPT_ROUNDS.
+    Hashes look like $2b$12$<salt+hash>.
+    """
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
 
 
 def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
@@ -46,50 +110,160 @@ def create_access_token(subject: Union[str, Any], expires_delta: timedelta = Non
     return encoded_jwt
 
 
-def encrypt_field(raw_value: str) -> str:
+def encrypt_bytes(raw_value: str) -> bytes:
     """
-    Encrypts a string using AES-256-GCM.
-    Returns format: IV(b64):TAG(b64):CIPHERTEXT(b64)
+    Encrypts a string using AES-256-GCM under the active key, in the compact
+    binary format used by the encrypted customer columns.
+    Returns format: VERSION(1 byte) + KEY_ID(1 byte) + NONCE(12 bytes) + CIPHERTEXT+TAG
     """
     if not raw_value:
-        return ""
-    
-    iv = os.urandom(12)  # NIST recommended IV size for GCM
-    
-    encryptor = Cipher(
-        algorithms.AES(ENCRYPTION_KEY_BYTES),
-        modes.GCM(iv),
-        backend=default_backend()
-    ).encryptor()
-    
-    ciphertext = encryptor.update(raw_value.encode()) + encryptor.finalize()
-    
-    return f"{base64.urlsafe_b64encode(iv).decode()}:{base64.urlsafe_b64encode(encryptor.tag).decode()}:{base64.urlsafe_b64encode(ciphertext).decode()}"
+        return b""
+
+    nonce = os.urandom(GCM_NONCE_SIZE)
+    sealed = _keyring[ACTIVE_KEY_ID].encrypt(nonce, raw_value.encode(), None)
+    return bytes([FIELD_FORMAT_V2, ACTIVE_KEY_ID]) + nonce + sealed
+
+
+def ciphertext_key_id(value: Union[str, bytes, None]) -> Optional[int]:
+    """
+    Key id of a binary-format ciphertext; None for legacy strings and plaintext.
+    """
+    if not isinstance(value, (bytes, bytearray)) or not value:
+        return None
+    if value[0] == FIELD_FORMAT_V1 and len(value) >= 1 + GCM_NONCE_SIZE + GCM_TAG_SIZE:
+        return 0
+    if value[0] == FIELD_FORMAT_V2 and len(value) >= 2 + GCM_NONCE_SIZE + GCM_TAG_SIZE:
+        return value[1]
+    return None
 
 
-def decrypt_field(encrypted_value: str) -> str:
+def _open_field(encrypted_value: Union[str, bytes]) -> str:
     """
-    Decrypts a string. Expects format: IV(b64):TAG(b64):CIPHERTEXT(b64)
+    Decrypts any format with the key it names (plaintext and empty values
+    pass through); raises on unknown keys, malformed or tampered input.
     """
+    key_id = ciphertext_key_id(encrypted_value)
+    if key_id is not None:
+        if key_id not in _keyring:
+            raise ValueError(f"Unknown encryption key id {key_id}")
+        header = 1 if encrypted_value[0] == FIELD_FORMAT_V1 else 2
+        nonce = bytes(encrypted_value[header:header + GCM_NONCE_SIZE])
+        sealed = bytes(encrypted_value[header + GCM_NONCE_SIZE:])
+        return _keyring[key_id].decrypt(nonce, sealed, None).decode()
+
+    if isinstance(encrypted_value, (bytes, bytearray)):
+        encrypted_value = encrypted_value.decode('utf-8')
     if not encrypted_value or ":" not in encrypted_value:
         return encrypted_value
-    
+
+    # Legacy IV(b64):TAG(b64):CIPHERTEXT(b64) string, key 0
+    iv, tag, ciphertext = encrypted_value.split(":")
+    sealed = base64.urlsafe_b64decode(ciphertext) + base64.urlsafe_b64decode(tag)
+    return _keyring[0].decrypt(base64.urlsafe_b64decode(iv), sealed, None).decode()
+
+
+def decrypt_field(encrypted_value: Union[str, bytes]) -> str:
+    """
+    Decrypts a string. Accepts the binary formats or the legacy
+    IV(b64):TAG(b64):CIPHERTEXT(b64) string (as str or UTF-8 bytes).
+    """
     try:
-        parts = encrypted_value.split(":")
-        if len(parts) != 3:
-            return ""
-        
-        iv = base64.urlsafe_b64decode(parts[0])
-        tag = base64.urlsafe_b64decode(parts[1])
-        ciphertext = base64.urlsafe_b64decode(parts[2])
-        
-        decryptor = Cipher(
-            algorithms.AES(ENCRYPTION_KEY_BYTES),
-            modes.GCM(iv, tag),
-            backend=default_backend()
-        ).decryptor()
-        
-        return (decryptor.update(ciphertext) + decryptor.finalize()).decode()
+        return _open_field(encrypted_value)
     except Exception as e:
         print(f"Decryption error: {e}")
         return ""
+
+
+def upgrade_ciphertext(encrypted_value: Union[str, bytes, None]) -> Optional[bytes]:
+    """
+    Re-encrypts a value under the active key in the current format.
+    Returns None when it is already current (or empty); raises if it cannot be decrypted.
+    """
+    if not encrypted_value:
+        return None
+    if ciphertext_key_id(encrypted_value) == ACTIVE_KEY_ID and encrypted_value[0] == FIELD_FORMAT_V2:
+        return None
+    return encrypt_bytes(_open_field(encrypted_value))
+
+
+def _decrypt_batch(values: Sequence[Union[str, bytes, None]]) -> List[Optional[str]]:
+    results = []
+    failures = 0
+    for value in values:
+        try:
+            results.append(_open_field(value))
+        except Exception:
+            failures += 1
+            results.append("")
+    if failures:
+        print(f"Decryption error: {failures} of {len(values)} values could not be decrypted")
+    return results
+
+
+def decrypt_many(values: Sequence[Union[str, bytes, None]]) -> List[Optional[str]]:
+    """
+    Batch decrypt_field: accepts either format, as str or raw column bytes, and
+    returns plaintexts in input order ("" for values that fail to decrypt,
+    empty values unchanged).
+    Batches of DECRYPT_PARALLEL_THRESHOLD or more are split across
+    DECRYPT_WORKERS threads.
+    """
+    global _decrypt_pool
+    workers = settings.DECRYPT_WORKERS
+    if workers <= 1 or len(values) < settings.DECRYPT_PARALLEL_THRESHOLD:
+        return _decrypt_batch(values)
+
+    if _decrypt_pool is None:
+        _decrypt_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decrypt")
+    size = -(-len(values) // workers)
+    slices = [values[start:start + size] for start in range(0, len(values), size)]
+    return [plain for batch in _decrypt_pool.map(_decrypt_batch, slices) for plain in batch]
+
+
+def normalize_mobile(mobile: str) -> str:
+    return "".join(str(mobile).split())
+
+
+def blind_index(value: str) -> str:
+    """
+    Deterministic keyed hash (HMAC-SHA256, hex) of a value, so encrypted
+    columns can be matched exactly without decrypting them.
+    """
+    return hmac.new(BLIND_INDEX_KEY_BYTES, value.encode(), hashlib.sha256).hexdigest()
+
+
+def mobile_blind_index(mobile: str) -> str:
+    return blind_index(normalize_mobile(mobile))
+
+
+def _name_words(text: str) -> List[str]:
+    # Case- and accent-insensitive words
+    folded = unicodedata.normalize("NFKD", text.casefold())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return re.findall(r"\w+", folded)
+
+
+def name_search_tokens(name: str) -> Set[str]:
+    """
+    Blind indexes of every word prefix of a name, NAME_SEARCH_MIN_PREFIX to
+    NAME_SEARCH_MAX_PREFIX characters long (a word shorter than the minimum
+    is indexed whole).
+    """
+    tokens = set()
+    for word in _name_words(name):
+        longest = min(len(word), settings.NAME_SEARCH_MAX_PREFIX)
+        for length in range(min(settings.NAME_SEARCH_MIN_PREFIX, longest), longest + 1):
+            tokens.add(blind_index("name:" + word[:length]))
+    return tokens
+
+
+def name_query_tokens(query: str) -> Set[str]:
+    """
+    One blind index per query word, matching name_search_tokens prefixes.
+    Words shorter than NAME_SEARCH_MIN_PREFIX are ignored.
+    """
+    return {
+        blind_index("name:" + word[:settings.NAME_SEARCH_MAX_PREFIX])
+        for word in _name_words(query)
+        if len(word) >= settings.NAME_SEARCH_MIN_PREFIX
+    }
@@ -1,21 +1,22 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from backend.app.core.config import settings
+from backend.app.core.pagination import NEXT_CURSOR_HEADER
 from backend.app.api.endpoints import auth, customers, investments, upload
 
 from contextlib import asynccontextmanager
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from backend.app.services.followup_engine import check_daily_followups
+from backend.app.services.scheduler import build_scheduler
+from backend.app.services.leader import release_lease
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    scheduler = AsyncIOScheduler()
-    # Run everyday at 9:00 AM
-    scheduler.add_job(check_daily_followups, 'cron', hour=9, minute=0)
-    # Also run once immediately on startup for Development/Verification
-    scheduler.add_job(check_daily_followups, 'date')
-    scheduler.start()
+    # Background jobs normally run in the worker process (backend.app.worker).
+    # If enabled here, only the scheduler lease holder actually runs them.
+    scheduler = None
+    if settings.WEB_RUN_SCHEDULER:
+        scheduler = build_scheduler()
+        scheduler.start()
     
     print("-" * 40)
     print(f"ADMIN SECRET: {settings.ADMIN_SECRET}")
@@ -23,7 +24,12 @@ async def lifespan(app: FastAPI):
     
     yield
     # Shutdown
-    scheduler.shutdown()
+    if scheduler:
+        scheduler.shutdown()
+        try:
+            await release_lease()
+        except Exception as e:
+            print(f"Could not release scheduler lease: {e}")
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -38,6 +44,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER], # Pagination cursor for list endpoints
 )
 
 @app.middleware("http")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DECIMAL, Date, DateTime, ForeignKey, Enum, Text, LargeBinary, Integer
+from sqlalchemy import Column, String, Boolean, DECIMAL, Date, DateTime, ForeignKey, Enum, Text, LargeBinary, Integer, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from backend.app.core.database import Base
 import uuid
@@ -7,8 +7,23 @@ import uuid
 def generate_uuid():
     return str(uuid.uuid4())
 
+def schedule_owner_key(agent_id, scheme_type) -> str:
+    """
+    "<agent_id>:<scheme_type>" with "*" for NULL (= every agent / scheme).
+    """
+    scheme_type = getattr(scheme_type, "value", scheme_type)
+    return f"{agent_id or '*'}:{scheme_type or '*'}"
+
+def _schedule_owner_key_default(context):
+    params = context.get_current_parameters()
+    return schedule_owner_key(params.get("agent_id"), params.get("scheme_type"))
+
 class Agent(Base):
     __tablename__ = "agent"
+    __table_args__ = (
+        # One account per number; also the index behind every login/verify lookup
+        UniqueConstraint("mobile", name="uq_agent_mobile"),
+    )
 
     agent_id = Column(String(36), primary_key=True, default=generate_uuid)
     name = Column(String(100))
@@ -18,9 +33,15 @@ class Agent(Base):
     failed_login_attempts = Column(Integer, default=0)
     locked_until = Column(DateTime, nullable=True)
     
-    is_verified = Column(Boolean, default=False)
-    verification_code = Column(String(10), nullable=True) # Plain or Hashed (Plain for MVP)
-    verification_code_expires_at = Column(DateTime, nullable=True)
+    is_verified = Column(Boolean, default=False) # Pending OTPs live in the OTP store (services/otp.py)
+
+class Otp(Base):
+    __tablename__ = "otp"
+
+    mobile = Column(String(50), primary_key=True)
+    code_hash = Column(String(64)) # Keyed hash, never the code itself
+    attempts = Column(Integer, default=0) # Failed verifications so far
+    expires_at = Column(DateTime, index=True)
 
 class Customer(Base):
     __tablename__ = "customer"
@@ -29,10 +50,29 @@ class Customer(Base):
     agent_id = Column(String(36), ForeignKey("agent.agent_id"))
     full_name = Column(LargeBinary(255)) # Encrypted
     mobile = Column(LargeBinary(255))    # Encrypted
+    mobile_bidx = Column(String(64))     # Blind index (HMAC) of mobile, for exact lookups
     consent_flag = Column(Boolean)
     consent_time = Column(DateTime)
     created_at = Column(DateTime, default=func.now())
 
+    __table_args__ = (
+        # Dedupe / lookup by phone number within an agent's book
+        Index("ix_customer_agent_mobile_bidx", "agent_id", "mobile_bidx"),
+        # Keyset pagination of an agent's customers
+        Index("ix_customer_agent_created", "agent_id", "created_at", "customer_id"),
+    )
+
+class CustomerNameToken(Base):
+    __tablename__ = "customer_name_token"
+    __table_args__ = (
+        # Name search: tokens of one agent's customers
+        Index("ix_customer_name_token_agent_token", "agent_id", "token_hash"),
+    )
+
+    customer_id = Column(String(36), ForeignKey("customer.customer_id"), primary_key=True)
+    token_hash = Column(String(64), primary_key=True) # Blind index of a name word or word prefix
+    agent_id = Column(String(36), ForeignKey("agent.agent_id"))
+
 class Investment(Base):
     __tablename__ = "investment"
 
@@ -41,14 +81,83 @@ class Investment(Base):
     scheme_type = Column(Enum('NSC','MIS','FD','KVP'))
     principal = Column(DECIMAL(12, 2))
     start_date = Column(Date)
-    maturity_date = Column(Date)
+    maturity_date = Column(Date, index=True) # Backfill scans range over stage windows
     status = Column(Enum('ACTIVE','MATURED','FOLLOWUP','REINVESTED','CLOSED'))
-    current_stage = Column(Enum('F10','F5','F3','F1','MT','P30'))
+    # Stage codes (F10, MT, P30, ...) come from configurable schedules, see services/followup_schedule
+    current_stage = Column(String(10))
+    # Precomputed by services/followup_schedule; the daily scan is a range scan on this index
+    next_stage = Column(String(10), nullable=True)
+    next_followup_date = Column(Date, nullable=True, index=True)
 
 class FollowupLog(Base):
     __tablename__ = "followup_log"
+    __table_args__ = (
+        # One reminder per investment and stage, even if two scans overlap
+        UniqueConstraint("investment_id", "stage", name="uq_followup_log_investment_stage"),
+    )
 
     log_id = Column(String(36), primary_key=True, default=generate_uuid)
     investment_id = Column(String(36), ForeignKey("investment.investment_id"))
-    stage = Column(Enum('F10','F5','F3','F1','MT','P30'))
+    stage = Column(String(10))
     sent_on = Column(DateTime)
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        # Worker polls PENDING rows whose next attempt is due
+        Index("ix_notification_outbox_due", "status", "next_attempt_at"),
+        # A digest recipient's pending lines are claimed together
+        Index("ix_notification_outbox_recipient", "to_number", "status"),
+    )
+
+    outbox_id = Column(String(36), primary_key=True, default=generate_uuid)
+    investment_id = Column(String(36), ForeignKey("investment.investment_id"), nullable=True)
+    stage = Column(String(10), nullable=True)
+    to_number = Column(String(50))
+    body = Column(Text, nullable=True) # NULL for reminders: rendered at send time, no customer PII at rest
+    digest = Column(Boolean, default=False) # Body is one line of a per-recipient digest
+    status = Column(Enum('PENDING','SENDING','SENT','DEAD'), default='PENDING')
+    # PENDING: when to try next; SENDING: when the worker's claim lapses
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=func.now())
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+class JobState(Base):
+    __tablename__ = "job_state"
+
+    job_name = Column(String(50), primary_key=True)
+    last_success_on = Column(Date, nullable=True) # Last completed daily run; gaps are reported
+    resume_key = Column(String(64), nullable=True) # Resume point for batched jobs (last row done)
+    progress = Column(Text, nullable=True) # JSON progress report of batched jobs
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_lease"
+
+    name = Column(String(50), primary_key=True)
+    holder = Column(String(100)) # Process currently allowed to run scheduled jobs
+    expires_at = Column(DateTime)
+
+class FollowupSchedule(Base):
+    __tablename__ = "followup_schedule"
+    __table_args__ = (
+        UniqueConstraint("agent_id", "scheme_type", name="uq_followup_schedule_owner"),
+        # The constraint above never fires when agent_id or scheme_type is
+        # NULL; this one also covers global and per-scheme schedules
+        UniqueConstraint("owner_key", name="uq_followup_schedule_owner_key"),
+    )
+
+    schedule_id = Column(String(36), primary_key=True, default=generate_uuid)
+    agent_id = Column(String(36), ForeignKey("agent.agent_id"), nullable=True) # NULL = every agent
+    scheme_type = Column(Enum('NSC','MIS','FD','KVP'), nullable=True) # NULL = every scheme
+    owner_key = Column(String(50), nullable=False, default=_schedule_owner_key_default) # See schedule_owner_key
+    name = Column(String(100))
+    created_at = Column(DateTime, default=func.now())
+
+class FollowupScheduleStage(Base):
+    __tablename__ = "followup_schedule_stage"
+
+    schedule_id = Column(String(36), ForeignKey("followup_schedule.schedule_id"), primary_key=True)
+    offset_days = Column(Integer, primary_key=True) # Days before maturity (negative = after)
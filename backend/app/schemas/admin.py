@@ -1,4 +1,8 @@
 from pydantic import BaseModel
+from datetime import date
+from typing import List, Optional
+
+from backend.app.schemas.investment import SchemeType
 
 class AdminLogin(BaseModel):
     secret_key: str
@@ -9,3 +13,13 @@ class SystemStats(BaseModel):
     total_investments: int
     total_investment_value: float
     pending_followups: int
+
+class FollowupBackfill(BaseModel):
+    start_date: date
+    end_date: date
+
+class FollowupScheduleIn(BaseModel):
+    agent_id: Optional[str] = None # None = every agent
+    scheme_type: Optional[SchemeType] = None # None = every scheme
+    name: str
+    offsets: List[int] # Days before maturity (negative = after); empty = no reminders
@@ -24,6 +24,18 @@ class VerifyOTP(BaseModel):
 class ResendOTP(BaseModel):
     mobile: str
 
+class AgentPrincipal(BaseModel):
+    """
+    The authenticated agent, as seen by endpoints (no password hash or OTP fields).
+    """
+    agent_id: str
+    name: Optional[str] = None
+    mobile: Optional[str] = None
+    is_verified: bool = False
+
+    class Config:
+        from_attributes = True
+
 class AgentResponse(BaseModel):
     agent_id: str
     name: str
@@ -1,6 +1,11 @@
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from enum import Enum
+
+class CustomerSort(str, Enum):
+    OLDEST_FIRST = "created_at"
+    NEWEST_FIRST = "-created_at"
 
 class CustomerBase(BaseModel):
     full_name: str
@@ -14,7 +19,7 @@ class CustomerResponse(CustomerBase):
     customer_id: str
     agent_id: str
     consent_time: Optional[datetime] = None
-    created_at: datetime
+    created_at: Optional[datetime] = None # NULL on some legacy rows
 
     class Config:
         from_attributes = True
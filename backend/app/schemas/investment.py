@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import date
 from enum import Enum
@@ -16,13 +16,8 @@ class InvestmentStatus(str, Enum):
     REINVESTED = 'REINVESTED'
     CLOSED = 'CLOSED'
 
-class StageEnum(str, Enum):
-    F10 = 'F10'
-    F5 = 'F5'
-    F3 = 'F3'
-    F1 = 'F1'
-    MT = 'MT'
-    P30 = 'P30'
+# Stage codes as written by followup_schedule.stage_code: F<days before>, MT, P<days after>
+STAGE_PATTERN = r"^(F\d{1,4}|MT|P\d{1,4})$"
 
 class InvestmentBase(BaseModel):
     scheme_type: SchemeType
@@ -30,7 +25,7 @@ class InvestmentBase(BaseModel):
     start_date: date
     maturity_date: date
     status: InvestmentStatus = InvestmentStatus.ACTIVE
-    current_stage: Optional[StageEnum] = None
+    current_stage: Optional[str] = Field(None, pattern=STAGE_PATTERN) # Stage code from the follow-up schedule, e.g. F10, MT, P30
 
 class InvestmentCreate(InvestmentBase):
     customer_id: str
@@ -38,6 +33,9 @@ class InvestmentCreate(InvestmentBase):
 class InvestmentResponse(InvestmentBase):
     investment_id: str
     customer_id: str
+    maturity_date: Optional[date] = None # NULL on some legacy rows
+    next_stage: Optional[str] = None
+    next_followup_date: Optional[date] = None
 
     class Config:
         from_attributes = True
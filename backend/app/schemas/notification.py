@@ -0,0 +1,7 @@
+from enum import Enum
+
+class OutboxStatus(str, Enum):
+    PENDING = 'PENDING'
+    SENDING = 'SENDING' # Claimed by a worker until next_attempt_at (lease)
+    SENT = 'SENT'
+    DEAD = 'DEAD'
@@ -1,39 +1,49 @@
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-from backend.app.models.base import Customer
-from backend.app.schemas.customer import CustomerCreate
-from backend.app.core.security import encrypt_field, decrypt_field
+from backend.app.models.base import Customer, CustomerNameToken
+from backend.app.schemas.customer import CustomerCreate, CustomerSort
+from backend.app.core.pagination import decode_cursor, encode_cursor, keyset_after
+from backend.app.services.pii_cache import Pii, ciphertext_fingerprint, pii_cache
+from backend.app.core.security import (
+    encrypt_bytes, decrypt_many, mobile_blind_index, name_search_tokens, name_query_tokens
+)
 
 async def create_new_customer(db: AsyncSession, customer_in: CustomerCreate, agent_id: str) -> Customer:
-    # Encrypt PII
-    encrypted_name = encrypt_field(customer_in.full_name)
-    encrypted_mobile = encrypt_field(customer_in.mobile)
-    
-    # Store binary/encrypted
-    # Wait, encrypt_field returns base64 string "IV:TAG:CIPHER".
-    # The DB column is LargeBinary(255).
-    # We should probably store it as bytes or change column to Text if it's base64 encoded string.
-    # The models/base.py defined it as LargeBinary(255). 
-    # If the output of encrypt_field is a string (base64 encoded), we can encode it to bytes to store in LargeBinary, 
-    # or just change model to String/Text.
-    # Given the format "IV:TAG:CIPHER" can get long, 255 bytes might be tight if name is long.
-    # 32 bytes (IV+TAG) + Ciphertext (Input length) + 2 colons. Base64 expands by 4/3.
-    # Let's verify encrypt_field output. It returns string.
-    # We will encode it to utf-8 bytes to store in LargeBinary.
+    # Encrypt PII into the compact binary format (fits LargeBinary(255) without base64)
+    encrypted_name = encrypt_bytes(customer_in.full_name)
+    encrypted_mobile = encrypt_bytes(customer_in.mobile)
     
     db_customer = Customer(
         agent_id=agent_id,
-        full_name=encrypted_name.encode('utf-8'),
-        mobile=encrypted_mobile.encode('utf-8'),
+        full_name=encrypted_name,
+        mobile=encrypted_mobile,
+        mobile_bidx=mobile_blind_index(customer_in.mobile),
         consent_flag=customer_in.consent_flag,
         consent_time=datetime.now() if customer_in.consent_flag else None
     )
     db.add(db_customer)
+    await db.flush()
+    # Searchable name tokens, committed with the customer
+    db.add_all(
+        CustomerNameToken(customer_id=db_customer.customer_id, agent_id=agent_id, token_hash=token)
+        for token in name_search_tokens(customer_in.full_name)
+    )
     await db.commit()
     await db.refresh(db_customer)
+    # Plaintext is already known; warm the cache
+    pii_cache.put(
+        db_customer.customer_id,
+        ciphertext_fingerprint(encrypted_name, encrypted_mobile),
+        (customer_in.full_name, customer_in.mobile)
+    )
+    # Respond with the plaintext the caller sent, not the ciphertext
+    db.expunge(db_customer)
+    db_customer.full_name = customer_in.full_name
+    db_customer.mobile = customer_in.mobile
     return db_customer
 
 async def get_customer_by_id(db: AsyncSession, customer_id: str) -> Optional[Customer]:
@@ -44,14 +54,143 @@ async def get_customer_by_id(db: AsyncSession, customer_id: str) -> Optional[Cus
         decrypt_customer_in_place(customer)
     return customer
 
+async def get_customer_owner(db: AsyncSession, customer_id: str) -> Optional[str]:
+    """
+    agent_id of a customer (None if it doesn't exist), without loading or
+    decrypting the row.
+    """
+    return await db.scalar(select(Customer.agent_id).where(Customer.customer_id == customer_id))
+
+async def find_customer_by_mobile(db: AsyncSession, agent_id: str, mobile: str) -> Optional[Customer]:
+    """
+    Exact match on the mobile blind index: one indexed query, no decrypts.
+    Returns the (still encrypted) customer, or None.
+    """
+    result = await db.execute(
+        select(Customer).where(
+            Customer.agent_id == agent_id,
+            Customer.mobile_bidx == mobile_blind_index(mobile)
+        ).order_by(Customer.created_at).limit(1)
+    )
+    return result.scalars().first()
+
+async def find_customer_ids_by_mobile(db: AsyncSession, agent_id: str, mobiles: Iterable[str]) -> Dict[str, str]:
+    """
+    Bulk find_customer_by_mobile: maps each given mobile that already belongs
+    to one of the agent's customers to that customer_id.
+    """
+    by_bidx = {}
+    for mobile in mobiles:
+        by_bidx.setdefault(mobile_blind_index(mobile), []).append(mobile)
+    if not by_bidx:
+        return {}
+
+    result = await db.execute(
+        select(Customer.mobile_bidx, Customer.customer_id).where(
+            Customer.agent_id == agent_id,
+            Customer.mobile_bidx.in_(list(by_bidx))
+        ).order_by(Customer.created_at.desc())
+    )
+    # Oldest customer wins when a number was stored twice
+    found = {}
+    for bidx, customer_id in result.all():
+        for mobile in by_bidx[bidx]:
+            found[mobile] = customer_id
+    return found
+
 async def list_agent_customers(db: AsyncSession, agent_id: str) -> List[Customer]:
     result = await db.execute(select(Customer).where(Customer.agent_id == agent_id))
+    return detach_and_decrypt(db, result.scalars().all())
+
+async def list_agent_customers_page(
+    db: AsyncSession,
+    agent_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    sort: CustomerSort = CustomerSort.OLDEST_FIRST
+) -> Tuple[List[Customer], Optional[str]]:
+    """
+    One page of an agent's customers in (created_at, customer_id) order,
+    after `cursor`. Only the page is decrypted. Returns the page and the
+    next page's cursor (None on the last page).
+    Raises ValueError for a malformed cursor.
+    """
+    descending = sort == CustomerSort.NEWEST_FIRST
+    stmt = select(Customer).where(Customer.agent_id == agent_id)
+    if cursor:
+        created_at, customer_id = after = decode_cursor(cursor, 2)
+        # created_at is NULL on some legacy rows
+        if not isinstance(created_at, (datetime, type(None))) or not isinstance(customer_id, str):
+            raise ValueError("Invalid cursor")
+        stmt = stmt.where(keyset_after(Customer.created_at, Customer.customer_id, after, descending))
+    if descending:
+        stmt = stmt.order_by(Customer.created_at.desc(), Customer.customer_id.desc())
+    else:
+        stmt = stmt.order_by(Customer.created_at, Customer.customer_id)
+
+    # One extra row tells whether another page exists
+    result = await db.execute(stmt.limit(limit + 1))
     customers = result.scalars().all()
-    # Decrypt all for display
-    # Note: iterating and decrypting might be slow for bulk, but necessary for encrypted DB.
+    next_cursor = None
+    if len(customers) > limit:
+        customers = customers[:limit]
+        next_cursor = encode_cursor(customers[-1].created_at, customers[-1].customer_id)
+    return detach_and_decrypt(db, customers), next_cursor
+
+async def search_customers(db: AsyncSession, agent_id: str, query: str, limit: int = 50) -> List[Customer]:
+    """
+    Customers whose name has a word starting with every word of the query.
+    Matching runs on the name token index; only the matches are decrypted.
+    """
+    tokens = name_query_tokens(query)
+    if not tokens:
+        return []
+
+    matches = (
+        select(CustomerNameToken.customer_id)
+        .where(CustomerNameToken.agent_id == agent_id, CustomerNameToken.token_hash.in_(tokens))
+        .group_by(CustomerNameToken.customer_id)
+        .having(func.count() == len(tokens))
+    )
+    result = await db.execute(
+        select(Customer).where(Customer.customer_id.in_(matches))
+        .order_by(Customer.created_at, Customer.customer_id).limit(limit)
+    )
+    return detach_and_decrypt(db, result.scalars().all())
+
+def decrypt_customer_pii(customers: Sequence[Customer]) -> List[Pii]:
+    """
+    (full_name, mobile) plaintexts for still-encrypted customers, in order.
+    Served from the PII cache where possible; the rest are decrypted in a
+    single batch and cached.
+    """
+    pii: List[Optional[Pii]] = []
+    missing = []
     for cust in customers:
-        db.expunge(cust) # Detach
-        decrypt_customer_in_place(cust)
+        fingerprint = ciphertext_fingerprint(cust.full_name, cust.mobile)
+        cached = pii_cache.get(cust.customer_id, fingerprint)
+        pii.append(cached)
+        if cached is None:
+            missing.append((len(pii) - 1, cust, fingerprint))
+
+    if missing:
+        plaintexts = decrypt_many([c.full_name for _, c, _ in missing] + [c.mobile for _, c, _ in missing])
+        names, mobiles = plaintexts[:len(missing)], plaintexts[len(missing):]
+        for (position, cust, fingerprint), name, mobile in zip(missing, names, mobiles):
+            pii[position] = (name, mobile)
+            # Failed decrypts come back as "" and are not cached
+            if name != "" and mobile != "":
+                pii_cache.put(cust.customer_id, fingerprint, (name, mobile))
+    return pii
+
+def detach_and_decrypt(db: AsyncSession, customers: List[Customer]) -> List[Customer]:
+    """
+    Detaches customers and replaces their names and mobiles with plaintext.
+    """
+    for cust, (name, mobile) in zip(customers, decrypt_customer_pii(customers)):
+        db.expunge(cust) # Detach to avoid saving decrypted data back to DB
+        cust.full_name = name
+        cust.mobile = mobile
     return customers
 
 def decrypt_customer_in_place(customer: Customer):
@@ -59,7 +198,4 @@ def decrypt_customer_in_place(customer: Customer):
     Helper to decrypt fields on a Customer model instance.
     We temporarily replace the binary content with the decrypted string for Pydantic response.
     """
-    if customer.full_name:
-        customer.full_name = decrypt_field(customer.full_name.decode('utf-8'))
-    if customer.mobile:
-        customer.mobile = decrypt_field(customer.mobile.decode('utf-8'))
+    customer.full_name, customer.mobile = decrypt_customer_pii([customer])[0]
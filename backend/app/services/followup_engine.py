@@ -1,157 +1,287 @@
 from datetime import date, timedelta
-from sqlalchemy.future import select
+from typing import Optional
+from sqlalchemy import and_, insert, literal, tuple_, union_all, Date, String
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.future import select
 
+from backend.app.core.config import settings
 from backend.app.core.database import SessionLocal
 from backend.app.models.base import Investment, Customer, FollowupLog, Agent
-from backend.app.services.sms import sms_service
+from backend.app.services.notification_outbox import enqueue_sms, release_digests
+from backend.app.services.followup_schedule import CompiledSchedules, load_schedules, stage_code, stage_offset
+from backend.app.services import job_state
 
-# ... (imports)
+from backend.app.schemas.investment import InvestmentStatus
 
-from backend.app.schemas.investment import StageEnum, InvestmentStatus
-from backend.app.core.security import decrypt_field
+FOLLOWUP_JOB = "daily_followups"
+
+def next_followups_query(today: date):
+    """
+    Select (Investment, Customer, Agent) rows whose precomputed next follow-up
+    has arrived. A range scan on ix_investment_next_followup_date; anything
+    left over from missed days is included automatically.
+    """
+    # Investment -> Customer -> Agent: the Customer's agent picks the
+    # schedule, and we notify the AGENT.
+    return select(Investment, Customer, Agent).join(
+        Customer, Investment.customer_id == Customer.customer_id
+    ).join(
+        Agent, Customer.agent_id == Agent.agent_id
+    ).where(
+        Investment.next_followup_date <= today,
+        Investment.status.in_([InvestmentStatus.ACTIVE, InvestmentStatus.FOLLOWUP])
+    )
 
-async def check_daily_followups():
+def stage_windows(offsets, start: date, end: date):
+    """
+    Derived table (stage, maturity_from, maturity_to): for each stage offset,
+    the maturity dates whose stage fires on some day in [start, end]. For a
+    single day each window is one exact date.
+    """
+    windows = [
+        select(
+            literal(stage_code(offset), String).label("stage"),
+            literal(start + timedelta(days=offset), Date).label("maturity_from"),
+            literal(end + timedelta(days=offset), Date).label("maturity_to"),
+        )
+        for offset in offsets
+    ]
+    return union_all(*windows).subquery("stage_window")
+
+def due_followups_query(schedules: CompiledSchedules, start: date, end: Optional[date] = None):
+    """
+    Select (Investment, Customer, Agent, trigger_stage) rows for every stage
+    offset used by any schedule that fell due between `start` and `end`
+    (default: `start` only) and has not been logged yet. An investment can
+    appear once per missed stage; callers drop stages that aren't in the
+    investment's own schedule.
+    Used for backfills; the daily scan relies on next_followup_date.
+    """
+    window = stage_windows(schedules.all_offsets(), start, end or start)
+
+    # Joining the stage windows lets the database range-scan maturity_date
+    # (indexed) and map each row to its stage in one set-based pass.
+    # Anti-join on FollowupLog skips reminders already sent for this stage
+    # without a lookup per row.
+    return select(Investment, Customer, Agent, window.c.stage.label("trigger_stage")).join(
+        window, Investment.maturity_date.between(window.c.maturity_from, window.c.maturity_to)
+    ).join(
+        Customer, Investment.customer_id == Customer.customer_id
+    ).join(
+        Agent, Customer.agent_id == Agent.agent_id
+    ).outerjoin(
+        FollowupLog, and_(
+            FollowupLog.investment_id == Investment.investment_id,
+            FollowupLog.stage == window.c.stage
+        )
+    ).where(
+        Investment.status.in_([InvestmentStatus.ACTIVE, InvestmentStatus.FOLLOWUP]),
+        FollowupLog.log_id.is_(None)
+    )
+
+async def check_daily_followups(chunk_size: Optional[int] = None):
     """
     Cron job function.
-    Scans investments and triggers notifications for due stages.
+    Scans investments and queues notifications for due stages.
+
+    Streams investments with next_followup_date <= today in keyset-paginated
+    chunks (see iter_chunks), queues every stage that has arrived (several
+    after missed days) and moves next_followup_date forward. The run date is
+    recorded in job_state on success; a gap since the previous one is logged.
     """
-    print(f"--- Running Daily Follow-up Scan: {date.today()} ---")
-    
+    today = date.today()
+    print(f"--- Running Daily Follow-up Scan: {today} ---")
+    processed = 0
+
     async with SessionLocal() as db:
-        today = date.today()
-        
-        # Get active investments
-        # We need to join Customer to get Agent ID? Or just use customer->agent link later.
-        # We need Customer mobile/name for the template, but we notify the AGENT.
-        # So: Investment -> Customer -> Agent
-        
-        # Optimization: Fetch only ACTIVE investments
-        # Note: In real production, batch this.
-        stmt = select(Investment).where(
-            Investment.status.in_([InvestmentStatus.ACTIVE, InvestmentStatus.FOLLOWUP])
-        ).options(joinedload(Investment.customer_id)) 
-        # joinedload might not work easily if relationship not defined in ORM models.
-        # Let's define relationships in models/base.py first? 
-        # Or just lazy load / query manually if relationships are missing.
-        # Given we didn't add relationships in models yet, let's query manually or use foreign keys/joins.
-        
-        # Let's assume we didn't define `relationship` in models/base.py (we didn't).
-        # We'll do a join in the select.
-        stmt = select(Investment, Customer, Agent).join(
-            Customer, Investment.customer_id == Customer.customer_id
-        ).join(
-            Agent, Customer.agent_id == Agent.agent_id
-        ).where(
-            Investment.status.in_([InvestmentStatus.ACTIVE, InvestmentStatus.FOLLOWUP])
+        last_success = await job_state.get_last_success(db, FOLLOWUP_JOB)
+    if last_success and (today - last_success).days > 1:
+        print(
+            f"WARNING: last successful follow-up scan was {last_success}. This run sends "
+            f"overdue stages; POST /admin/followups/backfill from "
+            f"{last_success + timedelta(days=1)} to queue anything else that was missed."
         )
-        
-        result = await db.execute(stmt)
-        rows = result.all()
-        
-        for investment, customer, agent in rows:
-            maturity = investment.maturity_date
-            days_diff = (maturity - today).days
-            
-            # Determine Trigger
-            trigger_stage = None
-            
-            if days_diff == 10:
-                trigger_stage = StageEnum.F10
-            elif days_diff == 5:
-                trigger_stage = StageEnum.F5
-            elif days_diff == 3:
-                trigger_stage = StageEnum.F3
-            elif days_diff == 1:
-                trigger_stage = StageEnum.F1
-            elif days_diff == 0:
-                trigger_stage = StageEnum.MT
-            elif days_diff == -30:
-                trigger_stage = StageEnum.P30
-            
-            if trigger_stage:
-                # Check if already logged (to avoid duplicate runs if job runs logic twice or restarts)
-                # Ideally, check FollowupLog for this investment + stage
-                existing_log = await db.execute(
-                    select(FollowupLog).where(
-                        FollowupLog.investment_id == investment.investment_id,
-                        FollowupLog.stage == trigger_stage
+
+    try:
+        async with SessionLocal() as db:
+            # Rules are compiled once; each row is then a few dict lookups
+            schedules = await load_schedules(db)
+            chunks = iter_chunks(db, next_followups_query(today), [Investment.investment_id], lambda row: (row[0].investment_id,), chunk_size)
+            async for rows in chunks:
+                # One query per chunk guards against stages already logged
+                # (e.g. by a backfill) instead of relying on the unique constraint
+                logged = await db.execute(
+                    select(FollowupLog.investment_id, FollowupLog.stage).where(
+                        FollowupLog.investment_id.in_([row[0].investment_id for row in rows])
                     )
                 )
-                if existing_log.scalars().first():
-                    continue
-
-                # Process Trigger
-                print(f"Triggering {trigger_stage} for Inv {investment.investment_id}")
-                
-                # Decrypt customer name for the message
-                cust_name = "Customer"
-                try:
-                    full_name_val = customer.full_name
-                    if isinstance(full_name_val, bytes):
-                        full_name_val = full_name_val.decode('utf-8')
-                    
-                    if full_name_val:
-                         cust_name = decrypt_field(full_name_val)
-                except Exception as e:
-                    print(f"Error decrypting name: {e}")
-                
-                # Notify Agent
-                # Template params: [AgentName, CustomerName, Scheme, Amount, DaysRemaining]
-                params = [
-                    agent.name,
-                    cust_name,
-                    investment.scheme_type,
-                    str(investment.principal),
-                    str(days_diff) if days_diff >= 0 else "Overdue"
-                ]
-                
-                # Decrypt customer mobile
-                cust_mobile = "Unspecified"
-                try:
-                    mobile_val = customer.mobile
-                    if isinstance(mobile_val, bytes):
-                        mobile_val = mobile_val.decode('utf-8')
-                    if mobile_val:
-                         cust_mobile = decrypt_field(mobile_val)
-                except Exception as e:
-                    print(f"Error decrypting mobile: {e}")
-
-                # Notify Agent via SMS
-                days_msg = f"{days_diff} days" if days_diff > 0 else "TODAY" if days_diff == 0 else f"{abs(days_diff)} days ago"
-                
-                status_label = "Matures"
-                if days_diff < 0:
-                    status_label = "Matured"
-                
-                sms_body = f"Reminder: Investment for {cust_name} ({cust_mobile}) ({investment.scheme_type}) {status_label} in {days_msg}. Amt: Rs. {investment.principal}"
-                
-                # Use send_sms directly for flexibility
-                sms_service.send_sms(agent.mobile, sms_body)
-
-                # WhatsApp - Commenting out as we are focusing on SMS
-                # await whatsapp_service.send_whatsapp_template(
-                #     to_mobile=agent.mobile,
-                #     template_name="investment_maturity_alert",
-                #     params=params
-                # )
-                
-                # Log it
-                log = FollowupLog(
-                    investment_id=investment.investment_id,
-                    stage=trigger_stage,
-                    sent_on=date.today()
-                )
-                db.add(log)
-                
-                # Update Investment Status/Stage
-                investment.current_stage = trigger_stage
-                if trigger_stage == StageEnum.MT:
-                    investment.status = InvestmentStatus.MATURED
-                else:
-                    investment.status = InvestmentStatus.FOLLOWUP
-                
-                # db.add(investment) # Already tracked
+                already_sent = set(logged.all())
+
+                due = []
+                handled = []
+                for investment, customer, agent in rows:
+                    schedule = schedules.resolve(customer.agent_id, investment.scheme_type)
+                    stages = schedule.due_stages(investment, today)
+                    due.extend(
+                        (investment, customer, agent, stage) for stage in stages
+                        if (investment.investment_id, stage) not in already_sent
+                    )
+                    # Schedule moves past every arrived stage, sent now or before.
+                    # Nothing due means next_stage is no longer in the schedule:
+                    # re-plan from it.
+                    handled.append((investment, schedule, stages[-1] if stages else investment.next_stage))
+                processed += await _process_chunk(db, due, today, handled)
+    finally:
+        # Digest lines queued by this run are held until now, so each
+        # agent gets them together (see enqueue_sms)
+        async with SessionLocal() as db:
+            await release_digests(db)
+
+    async with SessionLocal() as db:
+        await job_state.mark_success(db, FOLLOWUP_JOB, today)
+
+    print(f"--- Follow-up Scan Complete: {processed} reminders ---")
+
+async def backfill_followups(start: date, end: date, chunk_size: Optional[int] = None) -> int:
+    """
+    Queues every reminder that fell due between `start` and `end` (inclusive)
+    and was never logged. Does not move the daily job's last successful run.
+    """
+    print(f"--- Backfilling Follow-ups: {start} to {end} ---")
+    today = date.today()
+    processed = 0
+
+    try:
+        async with SessionLocal() as db:
+            schedules = await load_schedules(db)
+            stmt = due_followups_query(schedules, start, end)
+            trigger_stage = stmt.selected_columns.trigger_stage
+            chunks = iter_chunks(db, stmt, [Investment.investment_id, trigger_stage], lambda row: (row[0].investment_id, row[3]), chunk_size)
+            async for rows in chunks:
+                due = []
+                handled = []
+                for investment, customer, agent, stage in rows:
+                    schedule = schedules.resolve(customer.agent_id, investment.scheme_type)
+                    if stage in schedule.following:
+                        due.append((investment, customer, agent, stage))
+                        # None: move past the latest stage sent (current_stage)
+                        handled.append((investment, schedule, None))
+                processed += await _process_chunk(db, due, today, handled)
+    finally:
+        # Send the digest lines this backfill held back
+        async with SessionLocal() as db:
+            await release_digests(db)
+
+    print(f"--- Follow-up Backfill Complete: {processed} reminders ---")
+    return processed
+
+async def iter_chunks(db: AsyncSession, stmt, key_columns, key_of, chunk_size: Optional[int] = None):
+    """
+    Yields the rows of `stmt` in keyset-paginated chunks ordered by
+    `key_columns` (`key_of(row)` gives a row's key), `chunk_size` rows at a
+    time, defaulting to FOLLOWUP_SCAN_CHUNK_SIZE. The caller commits each chunk;
+    a crash only loses the chunk in flight. chunk_size=0 yields every row in
+    a single chunk (one transaction).
+    """
+    if chunk_size is None:
+        chunk_size = settings.FOLLOWUP_SCAN_CHUNK_SIZE
+
+    if not chunk_size:
+        result = await db.execute(stmt)
+        yield result.all()
+        return
+
+    last_key = None
+    while True:
+        page = stmt.order_by(*key_columns).limit(chunk_size)
+        if last_key is not None:
+            page = page.where(tuple_(*key_columns) > tuple_(*last_key))
+
+        result = await db.execute(page)
+        rows = result.all()
+        if not rows:
+            break
+
+        # Read the key before the caller commits (which expires the objects)
+        last_key = key_of(rows[-1])
+        yield rows
+        # Drop committed objects so memory stays flat across chunks
+        db.expunge_all()
+
+        if len(rows) < chunk_size:
+            break
+
+async def _log_reminders(db: AsyncSession, keys) -> set:
+    """
+    Inserts FollowupLog rows for (investment_id, stage) `keys` and returns the
+    keys this call logged. One bulk INSERT normally; if a concurrent run
+    already logged some of them (uq_followup_log_investment_stage), the
+    bulk insert is undone and retried row by row, ignoring duplicates, so
+    only those reminders are dropped.
+    """
+    values = [{"investment_id": investment_id, "stage": stage, "sent_on": date.today()} for investment_id, stage in keys]
+    if not values:
+        return set()
+    try:
+        async with db.begin_nested():
+            await db.execute(insert(FollowupLog), values)
+        return set(keys)
+    except IntegrityError:
+        logged = set()
+        for value in values:
+            result = await db.execute(
+                insert(FollowupLog).values(**value)
+                .prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite")
+            )
+            if result.rowcount:
+                logged.add((value["investment_id"], value["stage"]))
+        return logged
+
+async def _process_chunk(db: AsyncSession, rows, today: date, handled) -> int:
+    """
+    Queue, log and advance the stage for one chunk of due
+    (Investment, Customer, Agent, stage) rows, then commit.
+    `handled` lists (investment, schedule, stage) whose schedule moves past
+    that stage (None = past current_stage).
+    Delivery is left to the outbox worker, so this is a pure DB pass.
+    Returns the number of reminders committed.
+    """
+    # Log them first; only reminders logged by this run are queued
+    logged = await _log_reminders(db, [(row[0].investment_id, row[3]) for row in rows])
+
+    processed = 0
+    for investment, customer, agent, trigger_stage in rows:
+        if (investment.investment_id, trigger_stage) not in logged:
+            print(f"Skipping {trigger_stage} for Inv {investment.investment_id}: already logged")
+            continue
+        processed += 1
+
+        # Process Trigger
+        print(f"Triggering {trigger_stage} for Inv {investment.investment_id}")
+
+        # Notify Agent via SMS. Queued in the same transaction as the log;
+        # drain_outbox renders the text (with the customer's name) and delivers it
+        enqueue_sms(
+            db, agent.mobile,
+            investment_id=investment.investment_id,
+            stage=trigger_stage,
+            digest=settings.FOLLOWUP_DIGEST_MODE
+        )
+
+        # Update Investment Status/Stage
+        # (catch-up can queue several stages at once; keep the latest one)
+        if not investment.current_stage or stage_offset(investment.current_stage) > stage_offset(trigger_stage):
+            investment.current_stage = trigger_stage
+            if stage_offset(trigger_stage) == 0:
+                investment.status = InvestmentStatus.MATURED
+            else:
+                investment.status = InvestmentStatus.FOLLOWUP
         
-        await db.commit()
+        # db.add(investment) # Already tracked
+
+    for investment, schedule, handled_stage in handled:
+        schedule.advance(investment, handled_stage or investment.current_stage)
+
+    await db.commit()
+    return processed
@@ -0,0 +1,243 @@
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import delete, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from backend.app.core.database import SessionLocal
+from backend.app.models.base import Customer, Investment, FollowupSchedule, FollowupScheduleStage, schedule_owner_key
+from backend.app.schemas.investment import InvestmentStatus
+
+REPLAN_BATCH_SIZE = 1000
+
+# Days before maturity at which each stage fires (negative = after maturity).
+# Used when neither the agent nor the scheme has a schedule of its own.
+DEFAULT_OFFSETS = (10, 5, 3, 1, 0, -30)
+
+DEFAULT_SCHEDULE = "default"
+
+def stage_code(offset: int) -> str:
+    """
+    Stage label for an offset: F10 (10 days before), MT (maturity day), P30 (30 days after).
+    """
+    if offset > 0:
+        return f"F{offset}"
+    if offset == 0:
+        return "MT"
+    return f"P{-offset}"
+
+def stage_offset(stage: str) -> int:
+    """
+    Inverse of stage_code.
+    """
+    stage = str(getattr(stage, "value", stage))
+    if stage == "MT":
+        return 0
+    days = int(stage[1:])
+    return days if stage[0] == "F" else -days
+
+def stage_date(maturity_date: date, stage: str) -> date:
+    return maturity_date - timedelta(days=stage_offset(stage))
+
+class Schedule:
+    """
+    One follow-up cadence, with stage transitions precomputed so evaluating an
+    investment is a couple of dict lookups.
+    """
+    def __init__(self, key: str, offsets: Iterable[int]):
+        self.key = key
+        self.offsets = tuple(sorted(set(offsets), reverse=True))
+        self.stages = [stage_code(offset) for offset in self.offsets]
+        # None -> first stage, each stage -> the one after it, last -> None
+        self.following = dict(zip([None] + self.stages, self.stages + [None]))
+
+    def stage_after(self, stage: Optional[str]) -> Optional[str]:
+        """
+        The stage that follows `stage` (the first stage if None), or None after the last.
+        """
+        if stage is not None:
+            stage = str(getattr(stage, "value", stage))
+        if stage in self.following:
+            return self.following[stage]
+        # Stage from another schedule (the cadence changed): continue with
+        # the first of ours that fires later
+        offset = stage_offset(stage)
+        return next((s for s, o in zip(self.stages, self.offsets) if o < offset), None)
+
+    def schedule_new(self, investment: Investment, today: date):
+        """
+        Sets next_stage/next_followup_date for a freshly created (or replanned)
+        investment: the first stage after current_stage not dated before `today`.
+        """
+        investment.next_stage = None
+        investment.next_followup_date = None
+        if investment.status not in (InvestmentStatus.ACTIVE, InvestmentStatus.FOLLOWUP) or not investment.maturity_date:
+            return
+
+        stage = self.stage_after(investment.current_stage)
+        while stage and stage_date(investment.maturity_date, stage) < today:
+            stage = self.stage_after(stage)
+        if stage:
+            investment.next_stage = stage
+            investment.next_followup_date = stage_date(investment.maturity_date, stage)
+
+    def advance(self, investment: Investment, handled_stage: Optional[str]):
+        """
+        Moves next_stage/next_followup_date past `handled_stage` after reminders
+        up to it went out. Matured investments get no further reminders.
+        """
+        stage = self.stage_after(handled_stage)
+        if investment.status == InvestmentStatus.MATURED or not stage:
+            investment.next_stage = None
+            investment.next_followup_date = None
+        else:
+            investment.next_stage = stage
+            investment.next_followup_date = stage_date(investment.maturity_date, stage)
+
+    def due_stages(self, investment: Investment, today: date) -> List[str]:
+        """
+        Every stage from next_stage onwards whose date has arrived. Normally one;
+        more after missed days, so nothing is skipped.
+        A next_stage that isn't in this schedule was planned under a cadence
+        that has since changed (or been emptied): the walk continues with this
+        schedule's stages after it instead.
+        """
+        stages = []
+        stage = investment.next_stage
+        if stage is not None and str(getattr(stage, "value", stage)) not in self.following:
+            stage = self.stage_after(stage)
+        while stage and stage_date(investment.maturity_date, stage) <= today:
+            stages.append(stage)
+            stage = self.stage_after(stage)
+        return stages
+
+class CompiledSchedules:
+    """
+    All schedules compiled once per scan.
+    `owners` maps (agent_id, scheme_type) to a schedule key (None = any).
+    Per investment the scan only needs its schedule's stage transitions
+    (Schedule.following), since next_followup_date already says when.
+    """
+    def __init__(self, rows: Sequence[Tuple[str, Optional[str], Optional[str], Optional[int]]] = ()):
+        offsets: Dict[str, List[int]] = {DEFAULT_SCHEDULE: list(DEFAULT_OFFSETS)}
+        self.owners: Dict[Tuple[Optional[str], Optional[str]], str] = {}
+        for schedule_id, agent_id, scheme_type, offset_days in rows:
+            self.owners[(agent_id, scheme_type)] = schedule_id
+            # A schedule without stages is valid: no reminders at all
+            offsets.setdefault(schedule_id, [])
+            if offset_days is not None:
+                offsets[schedule_id].append(offset_days)
+
+        # A global row (no agent, no scheme) replaces the built-in default
+        if (None, None) in self.owners:
+            offsets[DEFAULT_SCHEDULE] = offsets[self.owners.pop((None, None))]
+
+        self.schedules = {key: Schedule(key, offs) for key, offs in offsets.items()}
+
+    def resolve(self, agent_id: Optional[str], scheme_type: Optional[str]) -> Schedule:
+        """
+        Most specific schedule wins: agent+scheme, agent, scheme, default.
+        """
+        scheme_type = getattr(scheme_type, "value", scheme_type)
+        owners = self.owners
+        key = (
+            owners.get((agent_id, scheme_type))
+            or owners.get((agent_id, None))
+            or owners.get((None, scheme_type))
+            or DEFAULT_SCHEDULE
+        )
+        return self.schedules[key]
+
+    def all_offsets(self) -> List[int]:
+        return sorted({offset for schedule in self.schedules.values() for offset in schedule.offsets}, reverse=True)
+
+async def load_schedules(db: AsyncSession, agent_ids: Optional[List[str]] = None) -> CompiledSchedules:
+    """
+    Loads schedule rules in one query and compiles them. With `agent_ids`, only
+    those agents' schedules plus the agent-independent ones are loaded.
+    """
+    stmt = select(
+        FollowupSchedule.schedule_id,
+        FollowupSchedule.agent_id,
+        FollowupSchedule.scheme_type,
+        FollowupScheduleStage.offset_days
+    ).outerjoin(
+        FollowupScheduleStage, FollowupScheduleStage.schedule_id == FollowupSchedule.schedule_id
+    )
+    if agent_ids is not None:
+        stmt = stmt.where(or_(FollowupSchedule.agent_id.is_(None), FollowupSchedule.agent_id.in_(agent_ids)))
+    # Deterministic if an old database still holds duplicate owners: the newest wins
+    stmt = stmt.order_by(FollowupSchedule.created_at, FollowupSchedule.schedule_id)
+
+    result = await db.execute(stmt)
+    return CompiledSchedules(result.all())
+
+async def save_schedule(
+    db: AsyncSession,
+    agent_id: Optional[str],
+    scheme_type: Optional[str],
+    name: str,
+    offsets: Iterable[int]
+) -> FollowupSchedule:
+    """
+    Creates or replaces the schedule owned by (agent_id, scheme_type), None
+    meaning every agent / scheme. An empty `offsets` means no reminders.
+    Existing investments keep their planned stage until replan_followups runs.
+    """
+    scheme_type = getattr(scheme_type, "value", scheme_type)
+    result = await db.execute(
+        select(FollowupSchedule).where(FollowupSchedule.owner_key == schedule_owner_key(agent_id, scheme_type))
+    )
+    schedule = result.scalars().first()
+    if schedule is None:
+        schedule = FollowupSchedule(agent_id=agent_id, scheme_type=scheme_type, name=name)
+        db.add(schedule)
+        await db.flush()
+    else:
+        schedule.name = name
+        await db.execute(delete(FollowupScheduleStage).where(FollowupScheduleStage.schedule_id == schedule.schedule_id))
+    db.add_all(FollowupScheduleStage(schedule_id=schedule.schedule_id, offset_days=offset) for offset in set(offsets))
+    await db.commit()
+    await db.refresh(schedule)
+    return schedule
+
+async def replan_followups(agent_id: Optional[str] = None, scheme_type: Optional[str] = None) -> int:
+    """
+    Recomputes next_stage/next_followup_date of open investments after a
+    schedule change, limited to `agent_id` and/or `scheme_type` (None = all),
+    in keyset batches. Each investment restarts from the stage after the last
+    one sent, skipping stages that passed before its old next_followup_date,
+    so reminders still owed from missed days stay due.
+    Returns the number of investments replanned.
+    """
+    scheme_type = getattr(scheme_type, "value", scheme_type)
+    print(f"--- Replanning follow-ups (agent {agent_id or 'all'}, scheme {scheme_type or 'all'}) ---")
+    today = date.today()
+    last_id = ""
+    total = 0
+    async with SessionLocal() as db:
+        schedules = await load_schedules(db, agent_ids=[agent_id] if agent_id else None)
+        while True:
+            stmt = select(Investment, Customer.agent_id).join(
+                Customer, Investment.customer_id == Customer.customer_id
+            ).where(
+                Investment.investment_id > last_id,
+                Investment.status.in_([InvestmentStatus.ACTIVE, InvestmentStatus.FOLLOWUP])
+            )
+            if agent_id:
+                stmt = stmt.where(Customer.agent_id == agent_id)
+            if scheme_type:
+                stmt = stmt.where(Investment.scheme_type == scheme_type)
+            result = await db.execute(stmt.order_by(Investment.investment_id).limit(REPLAN_BATCH_SIZE))
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1][0].investment_id
+            for investment, owner_id in rows:
+                since = min(investment.next_followup_date, today) if investment.next_followup_date else today
+                schedules.resolve(owner_id, investment.scheme_type).schedule_new(investment, since)
+            await db.commit()
+            db.expunge_all()
+            total += len(rows)
+    print(f"--- Replanned {total} investments ---")
+    return total
@@ -1,11 +1,23 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from typing import List, Optional, Tuple
+from datetime import date
 
-from backend.app.models.base import Investment
-from backend.app.schemas.investment import InvestmentCreate
+from backend.app.core.pagination import decode_cursor, encode_cursor, keyset_after
+from backend.app.models.base import Customer, Investment
+from backend.app.schemas.investment import InvestmentCreate, InvestmentStatus, SchemeType
+from backend.app.services.followup_schedule import CompiledSchedules, load_schedules
 
-async def create_investment(db: AsyncSession, investment_in: InvestmentCreate) -> Investment:
+async def create_investment(
+    db: AsyncSession,
+    investment_in: InvestmentCreate,
+    agent_id: str,
+    schedules: Optional[CompiledSchedules] = None
+) -> Investment:
+    """
+    `schedules` can be compiled once by callers creating many investments
+    (bulk upload); otherwise the owning agent's schedules are loaded here.
+    """
     db_investment = Investment(
         customer_id=investment_in.customer_id,
         scheme_type=investment_in.scheme_type,
@@ -15,6 +27,10 @@ async def create_investment(db: AsyncSession, investment_in: InvestmentCreate) -
         status=investment_in.status,
         current_stage=investment_in.current_stage
     )
+    # Precompute the first follow-up so the daily scan is a plain index lookup
+    if schedules is None:
+        schedules = await load_schedules(db, agent_ids=[agent_id])
+    schedules.resolve(agent_id, db_investment.scheme_type).schedule_new(db_investment, date.today())
     db.add(db_investment)
     await db.commit()
     await db.refresh(db_investment)
@@ -30,3 +46,60 @@ async def list_investments(db: AsyncSession, customer_id: str = None) -> List[In
         
     result = await db.execute(stmt)
     return result.scalars().all()
+
+async def list_agent_investments(
+    db: AsyncSession,
+    agent_id: str,
+    customer_id: Optional[str] = None,
+    status: Optional[InvestmentStatus] = None,
+    scheme_type: Optional[SchemeType] = None,
+    maturity_from: Optional[date] = None,
+    maturity_to: Optional[date] = None,
+    stage: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Tuple[List[Investment], Optional[str]]:
+    """
+    An agent's investments in one query, joined to Customer for ownership,
+    in (maturity_date, investment_id) order. Nothing is decrypted.
+    With `limit`, returns one page after `cursor` and the next page's cursor
+    (None on the last page); without it, every matching row.
+    Raises ValueError for a malformed cursor.
+    """
+    stmt = (
+        select(Investment)
+        .join(Customer, Customer.customer_id == Investment.customer_id)
+        .where(Customer.agent_id == agent_id)
+    )
+    if customer_id:
+        stmt = stmt.where(Investment.customer_id == customer_id)
+    if status:
+        stmt = stmt.where(Investment.status == status.value)
+    if scheme_type:
+        stmt = stmt.where(Investment.scheme_type == scheme_type.value)
+    if maturity_from:
+        stmt = stmt.where(Investment.maturity_date >= maturity_from)
+    if maturity_to:
+        stmt = stmt.where(Investment.maturity_date <= maturity_to)
+    if stage:
+        stmt = stmt.where(Investment.current_stage == stage)
+    if cursor:
+        maturity_date, investment_id = after = decode_cursor(cursor, 2)
+        # maturity_date is NULL on some legacy rows
+        if not isinstance(maturity_date, (date, type(None))) or not isinstance(investment_id, str):
+            raise ValueError("Invalid cursor")
+        stmt = stmt.where(keyset_after(Investment.maturity_date, Investment.investment_id, after))
+    stmt = stmt.order_by(Investment.maturity_date, Investment.investment_id)
+
+    if limit is None:
+        result = await db.execute(stmt)
+        return result.scalars().all(), None
+
+    # One extra row tells whether another page exists
+    result = await db.execute(stmt.limit(limit + 1))
+    investments = result.scalars().all()
+    next_cursor = None
+    if len(investments) > limit:
+        investments = investments[:limit]
+        next_cursor = encode_cursor(investments[-1].maturity_date, investments[-1].investment_id)
+    return investments, next_cursor
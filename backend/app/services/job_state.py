@@ -0,0 +1,42 @@
+import json
+from datetime import date
+from typing import Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.models.base import JobState
+
+async def get_last_success(db: AsyncSession, job_name: str) -> Optional[date]:
+    state = await db.get(JobState, job_name)
+    return state.last_success_on if state else None
+
+async def mark_success(db: AsyncSession, job_name: str, run_date: date):
+    """
+    Records `run_date` as the job's last successful run (never moves it backwards).
+    """
+    state = await db.get(JobState, job_name)
+    if not state:
+        state = JobState(job_name=job_name)
+        db.add(state)
+    if not state.last_success_on or run_date > state.last_success_on:
+        state.last_success_on = run_date
+    await db.commit()
+
+async def get_progress(db: AsyncSession, job_name: str) -> Tuple[Optional[str], dict]:
+    """
+    (cursor, progress) saved by a batched job; (None, {}) if it never ran.
+    """
+    state = await db.get(JobState, job_name)
+    if not state:
+        return None, {}
+    return state.resume_key, json.loads(state.progress) if state.progress else {}
+
+async def save_progress(db: AsyncSession, job_name: str, cursor: Optional[str], progress: dict):
+    """
+    Stores a batched job's resume cursor and progress report, in the caller's transaction.
+    """
+    state = await db.get(JobState, job_name)
+    if not state:
+        state = JobState(job_name=job_name)
+        db.add(state)
+    state.resume_key = cursor
+    state.progress = json.dumps(progress, default=str)
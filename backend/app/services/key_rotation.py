@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import func, update
+from sqlalchemy.future import select
+
+from backend.app.core.config import settings
+from backend.app.core.database import SessionLocal
+from backend.app.core.security import ACTIVE_KEY_ID, upgrade_ciphertext
+from backend.app.models.base import Customer
+from backend.app.services import job_state
+
+REENCRYPT_JOB = "reencrypt_customers"
+
+async def get_reencrypt_progress() -> dict:
+    async with SessionLocal() as db:
+        _, progress = await job_state.get_progress(db, REENCRYPT_JOB)
+    return progress
+
+async def reencrypt_customers(
+    batch_size: Optional[int] = None,
+    pause_seconds: Optional[float] = None,
+    restart: bool = False,
+    dry_run: bool = False
+) -> dict:
+    """
+    Re-encrypts customer names and mobiles that are not yet under the active
+    key (including legacy-format values), in primary-key batches.
+    Each batch commits its rows together with the resume cursor, so an
+    interrupted run continues where it stopped; the pause between batches
+    keeps locks short and leaves DB capacity for live traffic.
+    Returns the final progress report.
+    """
+    batch_size = batch_size or settings.REENCRYPT_BATCH_SIZE
+    pause_seconds = settings.REENCRYPT_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+
+    async with SessionLocal() as db:
+        cursor, progress = await job_state.get_progress(db, REENCRYPT_JOB)
+        total = await db.scalar(select(func.count(Customer.customer_id)))
+
+    # Start over after a finished run, on request, or when the target key changed
+    if restart or dry_run or not cursor or progress.get("key_id") != ACTIVE_KEY_ID:
+        cursor = ""
+        progress = {
+            "key_id": ACTIVE_KEY_ID,
+            "scanned": 0,
+            "rewritten": 0,
+            "failed": 0,
+            "started_at": datetime.now(),
+        }
+    progress.update(total=total, status="running", finished_at=None)
+    print(f"--- Re-encrypting customers under key {ACTIVE_KEY_ID} from {cursor or 'the start'} ({total} rows) ---")
+
+    while True:
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(Customer.customer_id, Customer.full_name, Customer.mobile)
+                .where(Customer.customer_id > cursor)
+                .order_by(Customer.customer_id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            cursor = rows[-1].customer_id
+
+            changes = []
+            for customer_id, full_name, mobile in rows:
+                try:
+                    change = {"full_name": upgrade_ciphertext(full_name), "mobile": upgrade_ciphertext(mobile)}
+                except Exception as e:
+                    # Left as-is and counted; a later run retries it
+                    print(f"Skipping customer {customer_id}: {e}")
+                    progress["failed"] += 1
+                    continue
+                change = {column: value for column, value in change.items() if value is not None}
+                if change:
+                    change["customer_id"] = customer_id
+                    changes.append(change)
+
+            progress["scanned"] += len(rows)
+            progress["rewritten"] += len(changes)
+            if not dry_run:
+                # Bulk UPDATE by primary key; one statement per set of columns
+                for columns in {tuple(sorted(change)) for change in changes}:
+                    await db.execute(update(Customer), [c for c in changes if tuple(sorted(c)) == columns])
+                await job_state.save_progress(db, REENCRYPT_JOB, cursor, progress)
+                await db.commit()
+
+        print(f"  {progress['scanned']}/{total} scanned, {progress['rewritten']} rewritten, {progress['failed']} failed")
+        if pause_seconds:
+            await asyncio.sleep(pause_seconds)
+
+    progress.update(status="dry-run" if dry_run else "finished", finished_at=datetime.now())
+    if not dry_run:
+        async with SessionLocal() as db:
+            # Cleared cursor: the next run starts a fresh pass
+            await job_state.save_progress(db, REENCRYPT_JOB, None, progress)
+            await db.commit()
+
+    print(f"--- Re-encryption {progress['status']}: {progress['rewritten']} rewritten, {progress['failed']} failed ---")
+    return progress
@@ -0,0 +1,78 @@
+import os
+import socket
+import uuid
+from datetime import timedelta
+from functools import wraps
+from sqlalchemy import func, update, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+from backend.app.core.config import settings
+from backend.app.core.database import SessionLocal
+from backend.app.models.base import SchedulerLease
+
+SCHEDULER_LEASE = "scheduler"
+
+# Identifies this process as a lease holder
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+async def try_acquire_lease(name: str = SCHEDULER_LEASE) -> bool:
+    """
+    Takes or renews the lease row `name` for this process.
+    Succeeds if we already hold it, it has expired, or it doesn't exist yet.
+    Expiry is written and checked against the database clock, never this
+    host's, so clock skew between hosts can't produce two leaders.
+    """
+    async with SessionLocal() as db:
+        now = await db.scalar(select(func.now()))
+        expires_at = now + timedelta(seconds=settings.SCHEDULER_LEASE_TTL_SECONDS)
+
+        # Single conditional UPDATE: the database arbitrates between processes
+        result = await db.execute(
+            update(SchedulerLease).where(
+                SchedulerLease.name == name,
+                or_(SchedulerLease.holder == INSTANCE_ID, SchedulerLease.expires_at <= func.now())
+            ).values(holder=INSTANCE_ID, expires_at=expires_at)
+        )
+        if result.rowcount:
+            await db.commit()
+            return True
+
+        # No row yet (first boot): whoever inserts it first becomes leader
+        db.add(SchedulerLease(name=name, holder=INSTANCE_ID, expires_at=expires_at))
+        try:
+            await db.commit()
+            return True
+        except IntegrityError:
+            await db.rollback()
+            return False
+
+async def release_lease(name: str = SCHEDULER_LEASE):
+    """
+    Gives the lease up on shutdown so another process can take over right away.
+    """
+    async with SessionLocal() as db:
+        await db.execute(
+            update(SchedulerLease).where(
+                SchedulerLease.name == name,
+                SchedulerLease.holder == INSTANCE_ID
+            ).values(expires_at=func.now())
+        )
+        await db.commit()
+
+def leader_only(job):
+    """
+    Wraps a scheduled coroutine so it only runs in the process holding the
+    scheduler lease. Every process can schedule it; followers skip the run.
+    """
+    @wraps(job)
+    async def wrapper(*args, **kwargs):
+        try:
+            is_leader = await try_acquire_lease()
+        except Exception as e:
+            print(f"Scheduler lease check failed, skipping {job.__name__}: {e}")
+            return None
+        if not is_leader:
+            return None
+        return await job(*args, **kwargs)
+    return wrapper
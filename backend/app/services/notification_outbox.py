@@ -0,0 +1,242 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, null, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from backend.app.core.config import settings
+from backend.app.core.database import SessionLocal
+from backend.app.models.base import NotificationOutbox
+from backend.app.schemas.notification import OutboxStatus
+from backend.app.services.reminder_message import render_bodies
+from backend.app.services.sms import sms_service
+
+def enqueue_sms(
+    db: AsyncSession,
+    to_number: str,
+    body: Optional[str] = None,
+    investment_id: Optional[str] = None,
+    stage: Optional[str] = None,
+    digest: bool = False
+) -> NotificationOutbox:
+    """
+    Queues an SMS for the delivery worker. Added to the caller's session so it
+    commits atomically with whatever produced it (e.g. the FollowupLog row).
+    Maturity reminders pass investment_id/stage and no body: their text names
+    the customer, so it is rendered at send time (see reminder_message) and
+    no customer PII is stored in the outbox.
+    With digest=True the body is a single line that gets combined with the
+    recipient's other pending digest lines into as few messages as possible.
+    Digest lines are held (next_attempt_at NULL) until release_digests runs
+    at the end of the scan queuing them, so a recipient's lines all go out
+    together instead of in whatever batches the worker happens to poll.
+    """
+    row = NotificationOutbox(
+        investment_id=investment_id,
+        stage=stage,
+        to_number=to_number,
+        body=body,
+        digest=digest,
+        status=OutboxStatus.PENDING,
+        attempts=0,
+        # null() rather than None, which would get the column default (now)
+        next_attempt_at=null() if digest else datetime.now()
+    )
+    db.add(row)
+    return row
+
+async def release_digests(db: AsyncSession) -> int:
+    """
+    Makes every held digest line due now. Returns the number released.
+    """
+    result = await db.execute(
+        update(NotificationOutbox).where(
+            NotificationOutbox.status == OutboxStatus.PENDING,
+            NotificationOutbox.digest.is_(True),
+            NotificationOutbox.next_attempt_at.is_(None)
+        ).values(next_attempt_at=datetime.now())
+    )
+    await db.commit()
+    return result.rowcount
+
+def backoff_delay(attempts: int) -> timedelta:
+    """
+    Exponential backoff after `attempts` failed deliveries, capped at OUTBOX_MAX_BACKOFF_SECONDS.
+    """
+    seconds = settings.OUTBOX_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(seconds, settings.OUTBOX_MAX_BACKOFF_SECONDS))
+
+def digest_header(count: int) -> str:
+    return f"Maturity reminders ({count}):"
+
+def pack_digest(rows: List[NotificationOutbox], bodies: Dict[str, str], max_chars: int) -> List[List[NotificationOutbox]]:
+    """
+    Greedily splits digest rows into groups whose combined message stays within
+    `max_chars`. A single over-long line still gets a message of its own.
+    """
+    packs = []
+    current = []
+    length = 0
+    for row in rows:
+        # +1 for the newline joining each line
+        line_length = len(bodies[row.outbox_id]) + 1
+        if current and len(digest_header(len(current) + 1)) + length + line_length > max_chars:
+            packs.append(current)
+            current = []
+            length = 0
+        current.append(row)
+        length += line_length
+    if current:
+        packs.append(current)
+    return packs
+
+def build_messages(rows: List[NotificationOutbox], bodies: Dict[str, str]) -> List[Tuple[str, str, List[NotificationOutbox]]]:
+    """
+    Turns a batch of outbox rows and their text (`bodies`, by outbox_id) into
+    (to_number, body, rows) messages.
+    Plain rows are sent as-is; digest rows are grouped per recipient.
+    """
+    messages = []
+    digests = {}
+    for row in rows:
+        if row.digest:
+            digests.setdefault(row.to_number, []).append(row)
+        else:
+            messages.append((row.to_number, bodies[row.outbox_id], [row]))
+
+    for to_number, digest_rows in digests.items():
+        for pack in pack_digest(digest_rows, bodies, settings.FOLLOWUP_DIGEST_MAX_CHARS):
+            body = "\n".join([digest_header(len(pack))] + [bodies[row.outbox_id] for row in pack])
+            messages.append((to_number, body, pack))
+    return messages
+
+def record_attempt(row: NotificationOutbox, sent: bool, now: datetime):
+    """
+    Applies one delivery attempt's outcome: SENT, rescheduled with backoff, or DEAD.
+    """
+    row.attempts = (row.attempts or 0) + 1
+    if sent:
+        row.status = OutboxStatus.SENT
+        row.sent_at = now
+        row.last_error = None
+    elif row.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        row.status = OutboxStatus.DEAD
+        row.last_error = "SMS provider rejected the message"
+        print(f"Outbox {row.outbox_id} dead-lettered after {row.attempts} attempts")
+    else:
+        row.status = OutboxStatus.PENDING
+        row.next_attempt_at = now + backoff_delay(row.attempts)
+        row.last_error = "SMS provider rejected the message"
+
+async def claim_batch(db: AsyncSession, batch_size: int, now: datetime) -> List[NotificationOutbox]:
+    """
+    Locks up to `batch_size` due rows (PENDING, or SENDING whose lease lapsed
+    because a worker died mid-send) and marks them SENDING until
+    now + OUTBOX_LEASE_SECONDS. Digest recipients in the batch bring all of
+    their due digest lines along, so each gets one digest.
+    The caller commits, releasing the locks before anything is sent.
+    """
+    # SKIP LOCKED lets several workers claim side by side without picking
+    # up the same rows (ignored on backends without it).
+    stmt = select(NotificationOutbox).where(
+        NotificationOutbox.status.in_([OutboxStatus.PENDING, OutboxStatus.SENDING]),
+        NotificationOutbox.next_attempt_at <= now
+    ).order_by(
+        NotificationOutbox.next_attempt_at
+    ).limit(batch_size).with_for_update(skip_locked=True)
+
+    result = await db.execute(stmt)
+    rows = list(result.scalars().all())
+
+    recipients = {row.to_number for row in rows if row.digest}
+    if recipients:
+        more = await db.execute(
+            select(NotificationOutbox).where(
+                NotificationOutbox.to_number.in_(recipients),
+                NotificationOutbox.digest.is_(True),
+                NotificationOutbox.status == OutboxStatus.PENDING,
+                NotificationOutbox.next_attempt_at <= now,
+                NotificationOutbox.outbox_id.notin_([row.outbox_id for row in rows])
+            ).with_for_update(skip_locked=True)
+        )
+        rows.extend(more.scalars().all())
+
+    lease_until = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+    for row in rows:
+        row.status = OutboxStatus.SENDING
+        row.next_attempt_at = lease_until
+    return rows
+
+async def drain_outbox(batch_size: Optional[int] = None) -> int:
+    """
+    Scheduled job: delivers due PENDING outbox rows in batches of `batch_size`
+    (default OUTBOX_BATCH_SIZE) until none are left. Digest rows in a batch are
+    combined per recipient (see build_messages).
+    Each batch is claimed in one short transaction (see claim_batch), sent
+    with no transaction open, and the outcomes recorded in a second one.
+    Failures are retried with exponential backoff; after OUTBOX_MAX_ATTEMPTS
+    the row is dead-lettered (status DEAD) and kept for inspection.
+    Returns the number of outbox rows delivered.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    delivered = 0
+
+    async with SessionLocal() as db:
+        while True:
+            rows = await claim_batch(db, batch_size, datetime.now())
+            if not rows:
+                break
+            bodies = await render_bodies(db, rows, date.today())
+            for row in rows:
+                if row.outbox_id not in bodies:
+                    row.status = OutboxStatus.DEAD
+                    row.last_error = "Investment no longer exists"
+            # Plain values: the commit below expires the rows
+            messages = [
+                (to_number, body, [row.outbox_id for row in group])
+                for to_number, body, group in build_messages([row for row in rows if row.outbox_id in bodies], bodies)
+            ]
+            await db.commit()
+
+            results = await sms_service.send_many([(to_number, body) for to_number, body, _ in messages])
+
+            now = datetime.now()
+            result = await db.execute(
+                select(NotificationOutbox).where(
+                    NotificationOutbox.outbox_id.in_([outbox_id for _, _, ids in messages for outbox_id in ids])
+                )
+            )
+            claimed = {row.outbox_id: row for row in result.scalars().all()}
+            # A digest's outcome applies to every reminder folded into it
+            for (_, _, ids), sent in zip(messages, results):
+                for outbox_id in ids:
+                    record_attempt(claimed[outbox_id], sent, now)
+                    if sent:
+                        delivered += 1
+
+            await db.commit()
+            db.expunge_all()
+
+            if len(rows) < batch_size:
+                break
+
+    if delivered:
+        print(f"--- Outbox: delivered {delivered} notifications ---")
+    return delivered
+
+async def purge_outbox() -> int:
+    """
+    Scheduled job: deletes SENT and DEAD rows older than OUTBOX_RETENTION_DAYS.
+    """
+    cutoff = datetime.now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    async with SessionLocal() as db:
+        result = await db.execute(
+            delete(NotificationOutbox).where(
+                NotificationOutbox.status.in_([OutboxStatus.SENT, OutboxStatus.DEAD]),
+                NotificationOutbox.created_at < cutoff
+            )
+        )
+        await db.commit()
+    if result.rowcount:
+        print(f"Purged {result.rowcount} old outbox rows")
+    return result.rowcount
@@ -0,0 +1,143 @@
+import hmac
+import secrets
+import time
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Dict, Tuple
+
+from sqlalchemy import delete, update
+
+from backend.app.core.config import settings
+from backend.app.core.database import SessionLocal
+from backend.app.core.security import blind_index, normalize_mobile
+from backend.app.models.base import Otp
+
+class OtpResult(str, Enum):
+    OK = "OK"
+    INVALID = "INVALID"
+    EXPIRED = "EXPIRED"
+    TOO_MANY_ATTEMPTS = "TOO_MANY_ATTEMPTS"
+
+def generate_code() -> str:
+    return "".join(secrets.choice("0123456789") for _ in range(settings.OTP_LENGTH))
+
+def hash_code(mobile: str, code: str) -> str:
+    # Keyed and bound to the number, so a leaked hash can't be brute-forced offline
+    return blind_index(f"otp:{mobile}:{code}")
+
+class InMemoryOtpStore:
+    """
+    Pending codes in this process: mobile -> (code hash, expiry, failed attempts).
+    Expired codes are swept as new ones are issued.
+    """
+    SWEEP_EVERY = 100
+
+    def __init__(self):
+        self._codes: Dict[str, Tuple[str, float, int]] = {}
+        self._issued = 0
+
+    async def issue(self, mobile: str) -> str:
+        mobile = normalize_mobile(mobile)
+        code = generate_code()
+        self._codes[mobile] = (hash_code(mobile, code), time.monotonic() + settings.OTP_TTL_SECONDS, 0)
+        self._issued += 1
+        if self._issued % self.SWEEP_EVERY == 0:
+            await self.purge_expired()
+        return code
+
+    async def verify(self, mobile: str, code: str) -> OtpResult:
+        mobile = normalize_mobile(mobile)
+        entry = self._codes.get(mobile)
+        if entry is None:
+            return OtpResult.INVALID
+        code_hash, expires_at, attempts = entry
+        if expires_at <= time.monotonic():
+            del self._codes[mobile]
+            return OtpResult.EXPIRED
+        if hmac.compare_digest(code_hash, hash_code(mobile, code)):
+            del self._codes[mobile]
+            return OtpResult.OK
+        attempts += 1
+        if attempts >= settings.OTP_MAX_ATTEMPTS:
+            del self._codes[mobile]
+            return OtpResult.TOO_MANY_ATTEMPTS
+        self._codes[mobile] = (code_hash, expires_at, attempts)
+        return OtpResult.INVALID
+
+    async def purge_expired(self) -> int:
+        now = time.monotonic()
+        expired = [mobile for mobile, (_, expires_at, _) in self._codes.items() if expires_at <= now]
+        for mobile in expired:
+            del self._codes[mobile]
+        return len(expired)
+
+class DbOtpStore:
+    """
+    Pending codes in the narrow `otp` table (one row per mobile), shared by
+    every process. purge_expired runs as a scheduled job.
+    """
+    async def issue(self, mobile: str) -> str:
+        mobile = normalize_mobile(mobile)
+        code = generate_code()
+        async with SessionLocal() as db:
+            # Replaces any pending code for the number
+            await db.execute(delete(Otp).where(Otp.mobile == mobile))
+            db.add(Otp(
+                mobile=mobile,
+                code_hash=hash_code(mobile, code),
+                attempts=0,
+                expires_at=datetime.now() + timedelta(seconds=settings.OTP_TTL_SECONDS)
+            ))
+            await db.commit()
+        return code
+
+    async def verify(self, mobile: str, code: str) -> OtpResult:
+        mobile = normalize_mobile(mobile)
+        async with SessionLocal() as db:
+            # Spend an attempt before comparing, in one conditional UPDATE: it
+            # row-locks the code until commit, so parallel guesses queue up and
+            # can never use more than OTP_MAX_ATTEMPTS between them
+            result = await db.execute(
+                update(Otp).where(
+                    Otp.mobile == mobile,
+                    Otp.attempts < settings.OTP_MAX_ATTEMPTS,
+                    Otp.expires_at > datetime.now()
+                ).values(attempts=Otp.attempts + 1)
+            )
+            otp = await db.get(Otp, mobile)
+            if otp is None:
+                await db.commit()
+                return OtpResult.INVALID
+            if not result.rowcount:
+                # Expired, or out of attempts
+                await db.delete(otp)
+                await db.commit()
+                return OtpResult.EXPIRED if otp.expires_at <= datetime.now() else OtpResult.TOO_MANY_ATTEMPTS
+            if hmac.compare_digest(otp.code_hash, hash_code(mobile, code)):
+                await db.delete(otp)
+                await db.commit()
+                return OtpResult.OK
+            if otp.attempts >= settings.OTP_MAX_ATTEMPTS:
+                await db.delete(otp)
+                await db.commit()
+                return OtpResult.TOO_MANY_ATTEMPTS
+            await db.commit()
+            return OtpResult.INVALID
+
+    async def purge_expired(self) -> int:
+        async with SessionLocal() as db:
+            result = await db.execute(delete(Otp).where(Otp.expires_at <= datetime.now()))
+            await db.commit()
+        return result.rowcount
+
+def build_store():
+    if settings.OTP_STORE == "db":
+        return DbOtpStore()
+    return InMemoryOtpStore()
+
+otp_store = build_store()
+
+async def purge_expired_otps():
+    purged = await otp_store.purge_expired()
+    if purged:
+        print(f"Purged {purged} expired OTPs")
@@ -0,0 +1,109 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from backend.app.core.config import settings
+
+# Rough per-entry cost of the key, tuple and strings, on top of the text itself
+ENTRY_OVERHEAD_BYTES = 300
+
+Pii = Tuple[Optional[str], Optional[str]] # (full_name, mobile)
+
+def ciphertext_fingerprint(full_name: Optional[bytes], mobile: Optional[bytes]) -> bytes:
+    """
+    Short hash of a customer's stored ciphertexts. Part of the cache key, so
+    a re-encrypted or edited row can never be served stale plaintext.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(full_name or b"")
+    digest.update(b"\0")
+    digest.update(mobile or b"")
+    return digest.digest()
+
+class PiiCache:
+    """
+    Per-process LRU + TTL cache of decrypted customer names and mobiles,
+    keyed by customer_id and ciphertext fingerprint. Bounded by entry count
+    and approximate memory; PII_CACHE_ENABLED=false turns it into a no-op.
+    """
+    def __init__(self, enabled: bool, max_entries: int, max_bytes: int, ttl_seconds: int):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, customer_id: str, fingerprint: bytes) -> Optional[Pii]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(customer_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        entry_fingerprint, pii, _, expires_at = entry
+        if expires_at <= time.monotonic():
+            self.expirations += 1
+            self._remove(customer_id)
+            self.misses += 1
+            return None
+        if entry_fingerprint != fingerprint:
+            self._remove(customer_id)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(customer_id)
+        self.hits += 1
+        return pii
+
+    def put(self, customer_id: str, fingerprint: bytes, pii: Pii):
+        if not self.enabled:
+            return
+        size = ENTRY_OVERHEAD_BYTES + sum(len(value) for value in pii if value)
+        if size > self.max_bytes:
+            return
+        self._remove(customer_id)
+        self._entries[customer_id] = (fingerprint, pii, size, time.monotonic() + self.ttl_seconds)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def invalidate(self, customer_id: str):
+        self._remove(customer_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "approx_bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, customer_id: str):
+        entry = self._entries.pop(customer_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+pii_cache = PiiCache(
+    enabled=settings.PII_CACHE_ENABLED,
+    max_entries=settings.PII_CACHE_MAX_ENTRIES,
+    max_bytes=settings.PII_CACHE_MAX_BYTES,
+    ttl_seconds=settings.PII_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,66 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from backend.app.core.config import settings
+from backend.app.schemas.auth import AgentPrincipal
+
+class PrincipalCache:
+    """
+    Per-process LRU + TTL cache of verified access token -> AgentPrincipal,
+    so authenticated requests can skip the agent lookup. An entry never
+    outlives its token; logout and lockout drop entries explicitly.
+    """
+    def __init__(self, enabled: bool, max_entries: int, ttl_seconds: int):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[AgentPrincipal]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        principal, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return principal
+
+    def put(self, token: str, principal: AgentPrincipal, token_expires_at: Optional[float] = None):
+        """
+        `token_expires_at` is the token's `exp` claim (epoch seconds).
+        """
+        if not self.enabled:
+            return
+        ttl = self.ttl_seconds
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0:
+            return
+        self._entries[token] = (principal, time.monotonic() + ttl)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_token(self, token: str):
+        self._entries.pop(token, None)
+
+    def invalidate_agent(self, agent_id: str):
+        """
+        Drops every cached token of an agent (lockout, profile change).
+        """
+        for token in [t for t, (principal, _) in self._entries.items() if principal.agent_id == agent_id]:
+            del self._entries[token]
+
+    def clear(self):
+        self._entries.clear()
+
+principal_cache = PrincipalCache(
+    enabled=settings.AUTH_CACHE_ENABLED,
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS,
+)
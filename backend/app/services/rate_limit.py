@@ -0,0 +1,86 @@
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+from backend.app.core.config import settings
+
+def parse_limit(spec: str) -> Tuple[int, int]:
+    """
+    "5/60" -> (5 requests, 60 second window).
+    """
+    count, _, seconds = spec.partition("/")
+    return int(count), int(seconds)
+
+class InMemorySlidingWindow:
+    """
+    Sliding-window log per key, in this process only. The least recently
+    used keys are dropped beyond `max_keys` so memory stays bounded.
+    """
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._hits: "OrderedDict[str, deque]" = OrderedDict()
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> Optional[float]:
+        """
+        Records a request; returns seconds until retry if it is over the limit.
+        """
+        now = time.monotonic()
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque()
+        else:
+            self._hits.move_to_end(key)
+        while hits and hits[0] <= now - window_seconds:
+            hits.popleft()
+        if len(hits) >= limit:
+            return hits[0] + window_seconds - now
+        hits.append(now)
+        while len(self._hits) > self.max_keys:
+            self._hits.popitem(last=False)
+        return None
+
+class RedisSlidingWindow:
+    """
+    Sliding-window log in Redis sorted sets, shared by every process.
+    Fails open (allows the request) if Redis is unreachable.
+    """
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package") from e
+        self.redis = aioredis.from_url(url)
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> Optional[float]:
+        now = time.time()
+        member = f"{now}:{uuid.uuid4().hex}"
+        redis_key = f"ratelimit:{key}"
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.zremrangebyscore(redis_key, 0, now - window_seconds)
+                pipe.zadd(redis_key, {member: now})
+                pipe.zcard(redis_key)
+                pipe.zrange(redis_key, 0, 0, withscores=True)
+                pipe.expire(redis_key, window_seconds)
+                _, _, count, oldest, _ = await pipe.execute()
+            if count > limit:
+                await self.redis.zrem(redis_key, member)
+                return oldest[0][1] + window_seconds - now if oldest else window_seconds
+        except Exception as e:
+            print(f"Rate limiter unavailable, allowing request: {e}")
+        return None
+
+def build_backend():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisSlidingWindow(settings.RATE_LIMIT_REDIS_URL)
+    return InMemorySlidingWindow(settings.RATE_LIMIT_MAX_KEYS)
+
+# Per scope: (limit per client IP, limit per mobile number)
+RATE_LIMITS: Dict[str, Tuple[str, str]] = {
+    "login": (settings.RATE_LIMIT_LOGIN_PER_IP, settings.RATE_LIMIT_LOGIN_PER_MOBILE),
+    "otp_send": (settings.RATE_LIMIT_OTP_SEND_PER_IP, settings.RATE_LIMIT_OTP_SEND_PER_MOBILE),
+    "otp_verify": (settings.RATE_LIMIT_OTP_VERIFY_PER_IP, settings.RATE_LIMIT_OTP_VERIFY_PER_MOBILE),
+}
+
+rate_limiter = build_backend()
@@ -0,0 +1,63 @@
+from datetime import date
+from typing import Dict, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from backend.app.models.base import Customer, Investment, NotificationOutbox
+from backend.app.services.customer_service import decrypt_customer_pii
+
+def reminder_text(investment: Investment, cust_name: str, cust_mobile: str, today: date, digest: bool) -> str:
+    """
+    Text of a maturity reminder to the agent. With `digest`, a single line
+    that drain_outbox folds into the agent's digest.
+    """
+    days_diff = (investment.maturity_date - today).days
+    cust_name = cust_name or "Customer"
+    cust_mobile = cust_mobile or "Unspecified"
+
+    days_msg = f"{days_diff} days" if days_diff > 0 else "TODAY" if days_diff == 0 else f"{abs(days_diff)} days ago"
+
+    status_label = "Matures"
+    if days_diff < 0:
+        status_label = "Matured"
+
+    # WhatsApp - Commenting out as we are focusing on SMS
+    # Template params: [AgentName, CustomerName, Scheme, Amount, DaysRemaining]
+    # await whatsapp_service.send_whatsapp_template(
+    #     to_mobile=agent.mobile,
+    #     template_name="investment_maturity_alert",
+    #     params=[agent.name, cust_name, investment.scheme_type, str(investment.principal),
+    #             str(days_diff) if days_diff >= 0 else "Overdue"]
+    # )
+
+    if digest:
+        when = f"in {days_diff} days" if days_diff > 0 else "today" if days_diff == 0 else f"{abs(days_diff)} days ago"
+        return f"{cust_name} ({cust_mobile}) {investment.scheme_type} Rs.{investment.principal} {status_label.lower()} {when}"
+    return f"Reminder: Investment for {cust_name} ({cust_mobile}) ({investment.scheme_type}) {status_label} in {days_msg}. Amt: Rs. {investment.principal}"
+
+async def render_bodies(db: AsyncSession, rows: List[NotificationOutbox], today: date) -> Dict[str, str]:
+    """
+    Message text per outbox_id. Reminder rows store no text (it names the
+    customer), so theirs is rendered here from the investment, with the
+    customers decrypted in one batch; other rows use their stored body.
+    Rows whose investment no longer exists are left out.
+    """
+    bodies = {row.outbox_id: row.body for row in rows if row.body is not None}
+    investment_ids = {row.investment_id for row in rows if row.body is None and row.investment_id}
+    if not investment_ids:
+        return bodies
+
+    result = await db.execute(
+        select(Investment, Customer).join(
+            Customer, Investment.customer_id == Customer.customer_id
+        ).where(Investment.investment_id.in_(investment_ids))
+    )
+    pairs = result.all()
+    pii = decrypt_customer_pii([customer for _, customer in pairs])
+    found = {investment.investment_id: (investment, name, mobile) for (investment, _), (name, mobile) in zip(pairs, pii)}
+
+    for row in rows:
+        if row.body is None and row.investment_id in found:
+            investment, name, mobile = found[row.investment_id]
+            bodies[row.outbox_id] = reminder_text(investment, name, mobile, today, row.digest)
+    return bodies
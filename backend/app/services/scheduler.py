@@ -0,0 +1,29 @@
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from backend.app.core.config import settings
+from backend.app.services.followup_engine import check_daily_followups
+from backend.app.services.notification_outbox import drain_outbox, purge_outbox
+from backend.app.services.leader import leader_only, try_acquire_lease
+from backend.app.services.otp import purge_expired_otps
+
+def build_scheduler() -> AsyncIOScheduler:
+    """
+    Background jobs. Every job is leader-only, so running this in several
+    processes still executes each job once.
+    """
+    scheduler = AsyncIOScheduler()
+    # Run everyday at 9:00 AM
+    scheduler.add_job(leader_only(check_daily_followups), 'cron', hour=9, minute=0)
+    if settings.FOLLOWUP_RUN_ON_STARTUP:
+        # Also run once immediately on startup for Development/Verification
+        scheduler.add_job(leader_only(check_daily_followups), 'date')
+    # Deliver queued notifications (with retries) independently of the scan
+    scheduler.add_job(leader_only(drain_outbox), 'interval', seconds=settings.OUTBOX_POLL_SECONDS, max_instances=1, coalesce=True)
+    # Delete delivered and dead-lettered notifications past retention
+    scheduler.add_job(leader_only(purge_outbox), 'cron', hour=3, minute=0)
+    if settings.OTP_STORE == "db":
+        # Delete expired codes from the otp table
+        scheduler.add_job(leader_only(purge_expired_otps), 'interval', minutes=settings.OTP_PURGE_MINUTES, max_instances=1, coalesce=True)
+    # Keep the lease while long jobs run, and let a follower take over if the leader dies
+    scheduler.add_job(try_acquire_lease, 'interval', seconds=settings.SCHEDULER_LEASE_RENEW_SECONDS, max_instances=1, coalesce=True)
+    return scheduler
@@ -1,3 +1,7 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
 from twilio.rest import Client
 from backend.app.core.config import settings
 
@@ -9,6 +13,9 @@ class SmsService:
             self.client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
         else:
             print("Twilio credentials missing. SMS Service disabled.")
+        # The Twilio client is blocking; async callers dispatch through this pool
+        self.concurrency = settings.SMS_DISPATCH_CONCURRENCY
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="sms")
 
     def send_sms(self, to_number: str, body: str):
         if not self.client:
@@ -31,6 +38,27 @@ class SmsService:
             print(f"Failed to send SMS: {e}")
             return False
 
+    async def send_sms_async(self, to_number: str, body: str) -> bool:
+        """
+        send_sms without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.send_sms, to_number, body)
+
+    async def send_many(self, messages: List[Tuple[str, str]], concurrency: Optional[int] = None) -> List[bool]:
+        """
+        Sends (to_number, body) pairs concurrently off the event loop, at most
+        `concurrency` (default SMS_DISPATCH_CONCURRENCY) in flight at once.
+        Returns one result per message, in input order.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def send_one(to_number: str, body: str) -> bool:
+            async with semaphore:
+                return await self.send_sms_async(to_number, body)
+
+        return await asyncio.gather(*(send_one(to_number, body) for to_number, body in messages))
+
     def send_verification_code(self, to_number: str, code: str):
         body = f"Your verification code is: {code}. Do not share this with anyone."
         return self.send_sms(to_number, body)
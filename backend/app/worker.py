@@ -0,0 +1,42 @@
+# Background worker: runs the scheduled jobs (follow-up scan, outbox delivery)
+# outside the web processes.
+#   python -m backend.app.worker
+import asyncio
+import signal
+import sys
+
+from backend.app.core.config import settings
+
+# Jobs get their own, smaller pool instead of the web sizing. core.database
+# builds the process's only engine on first import, so size it first.
+if "backend.app.core.database" in sys.modules:
+    print("Warning: database engine already built; worker pool size not applied")
+settings.DB_POOL_SIZE = settings.WORKER_DB_POOL_SIZE
+settings.DB_MAX_OVERFLOW = 0
+
+from backend.app.core import database
+from backend.app.services.scheduler import build_scheduler
+from backend.app.services.leader import release_lease
+
+async def run_worker():
+    scheduler = build_scheduler()
+    scheduler.start()
+    print("--- Worker started ---")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await stop.wait()
+
+    print("--- Worker stopping ---")
+    scheduler.shutdown()
+    try:
+        await release_lease()
+    except Exception as e:
+        print(f"Could not release scheduler lease: {e}")
+    await database.engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
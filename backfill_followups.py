@@ -0,0 +1,17 @@
+import argparse
+import asyncio
+from datetime import date
+from backend.app.services.followup_engine import backfill_followups
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Queue follow-up reminders missed between two dates (inclusive).")
+    parser.add_argument("start", type=date.fromisoformat, help="First day to backfill (YYYY-MM-DD)")
+    parser.add_argument("end", type=date.fromisoformat, nargs="?", default=date.today(), help="Last day to backfill (default: today)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Rows per committed chunk")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.start > args.end:
+        raise SystemExit("start must be on or before end")
+    asyncio.run(backfill_followups(args.start, args.end, chunk_size=args.chunk_size))
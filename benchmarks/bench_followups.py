@@ -0,0 +1,259 @@
+# Synthetic-load benchmark for the follow-up engine.
+#
+#   pip install aiosqlite
+#   python -m benchmarks.bench_followups --investments 100000
+#   python -m benchmarks.bench_followups --investments 1000000 --chunk-size 2000 --json out.json
+#
+# Seeds a throwaway SQLite database (or --db-url, e.g. a local MySQL; its tables
+# are DROPPED) with agents, customers and investments spread across maturity
+# dates, then runs check_daily_followups and drain_outbox against a mock SMS
+# sink and reports wall time, query count, rows fetched, peak RSS and
+# messages per second.
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+# Settings are required at import time; a benchmark never touches real credentials
+os.environ.setdefault("DB_USER", "bench")
+os.environ.setdefault("DB_PASSWORD", "bench")
+os.environ.setdefault("DB_HOST", "localhost")
+os.environ.setdefault("DB_PORT", "3306")
+os.environ.setdefault("DB_NAME", "bench")
+os.environ.setdefault("DB_SSL", "false")
+os.environ.setdefault("ENCRYPTION_KEY", base64.urlsafe_b64encode(b"b" * 32).decode())
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.app.core import database
+from backend.app.core.database import Base, SessionLocal
+from backend.app.core.security import encrypt_bytes
+from backend.app.models.base import Agent, Customer, Investment, NotificationOutbox
+from backend.app.schemas.investment import InvestmentStatus
+from backend.app.services.followup_engine import check_daily_followups
+from backend.app.services.followup_schedule import CompiledSchedules
+from backend.app.services.notification_outbox import drain_outbox
+from backend.app.services.sms import sms_service
+
+SCHEMES = ['NSC', 'MIS', 'FD', 'KVP']
+INSERT_BATCH = 5000
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the follow-up scan and outbox delivery on synthetic data.")
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--investments", type=int, default=10000)
+    parser.add_argument("--days-before", type=int, default=60, help="Earliest maturity date, in days before today")
+    parser.add_argument("--days-after", type=int, default=365, help="Latest maturity date, in days after today")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Scan chunk size (default: FOLLOWUP_SCAN_CHUNK_SIZE)")
+    parser.add_argument("--sms-latency-ms", type=float, default=0.0, help="Simulated provider latency per message")
+    parser.add_argument("--db-url", default=None, help="Async SQLAlchemy URL to benchmark against (tables are dropped!)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic data")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the report to this file")
+    return parser.parse_args()
+
+async def seed_database(db_url: str, args):
+    """
+    Recreates the schema and bulk-inserts the synthetic book.
+    """
+    engine = create_async_engine(db_url)
+    rng = random.Random(args.seed)
+    today = date.today()
+    # Default schedule; investments get their next follow-up like create_investment does
+    schedules = CompiledSchedules()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    # A few real ciphertexts, reused, keep seeding fast while decrypts stay realistic
+    names = [encrypt_bytes(f"Customer {i}") for i in range(50)]
+    mobiles = [encrypt_bytes(f"9{i:09d}") for i in range(50)]
+
+    agent_ids = [str(uuid.uuid4()) for _ in range(args.agents)]
+    customer_rows = [
+        {
+            "customer_id": str(uuid.uuid4()),
+            "agent_id": rng.choice(agent_ids),
+            "full_name": rng.choice(names),
+            "mobile": rng.choice(mobiles),
+            "consent_flag": True,
+        }
+        for _ in range(args.customers)
+    ]
+    customer_ids = [row["customer_id"] for row in customer_rows]
+
+    async with engine.begin() as conn:
+        await conn.execute(insert(Agent), [
+            {"agent_id": agent_id, "name": f"Agent {i}", "mobile": f"8{i:09d}", "is_verified": True}
+            for i, agent_id in enumerate(agent_ids)
+        ])
+        for start in range(0, len(customer_rows), INSERT_BATCH):
+            await conn.execute(insert(Customer), customer_rows[start:start + INSERT_BATCH])
+
+        batch = []
+        for _ in range(args.investments):
+            maturity = today + timedelta(days=rng.randint(-args.days_before, args.days_after))
+            investment = SimpleNamespace(
+                status=InvestmentStatus.ACTIVE, current_stage=None, maturity_date=maturity,
+                next_stage=None, next_followup_date=None
+            )
+            schedules.resolve(None, None).schedule_new(investment, today)
+            batch.append({
+                "investment_id": str(uuid.uuid4()),
+                "customer_id": rng.choice(customer_ids),
+                "scheme_type": rng.choice(SCHEMES),
+                "principal": rng.randint(1, 500) * 1000,
+                "start_date": maturity - timedelta(days=365 * 5),
+                "maturity_date": maturity,
+                "status": InvestmentStatus.ACTIVE,
+                "next_stage": investment.next_stage,
+                "next_followup_date": investment.next_followup_date,
+            })
+            if len(batch) >= INSERT_BATCH:
+                await conn.execute(insert(Investment), batch)
+                batch = []
+        if batch:
+            await conn.execute(insert(Investment), batch)
+
+    await engine.dispose()
+
+def _seed_process(db_url: str, args):
+    asyncio.run(seed_database(db_url, args))
+
+class Counters:
+    """
+    Query count (cursor executions) and rows fetched (ORM entities loaded).
+    """
+    def __init__(self, engine):
+        self.queries = 0
+        self.rows = {}
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_query)
+        for model in (Investment, Customer, Agent, NotificationOutbox):
+            event.listen(model, "load", self._on_load(model.__tablename__))
+
+    def _on_query(self, *args):
+        self.queries += 1
+
+    def _on_load(self, name):
+        def listener(target, context):
+            self.rows[name] = self.rows.get(name, 0) + 1
+        return listener
+
+    def snapshot(self):
+        return self.queries, dict(self.rows)
+
+def diff(after, before):
+    queries = after[0] - before[0]
+    rows = {name: count - before[1].get(name, 0) for name, count in after[1].items() if count - before[1].get(name, 0)}
+    return queries, rows
+
+def install_sms_sink(latency_ms: float):
+    """
+    Replaces the Twilio call with a counter (plus optional simulated latency).
+    """
+    sent = []
+
+    def send_sms(to_number: str, body: str):
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        sent.append(to_number)
+        return True
+
+    sms_service.send_sms = send_sms
+    return sent
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+async def run_benchmark(db_url: str, args) -> dict:
+    engine = create_async_engine(db_url)
+    database.engine = engine
+    SessionLocal.configure(bind=engine)
+    counters = Counters(engine)
+    sent = install_sms_sink(args.sms_latency_ms)
+
+    before = counters.snapshot()
+    started = time.perf_counter()
+    await check_daily_followups(chunk_size=args.chunk_size)
+    scan_seconds = time.perf_counter() - started
+    scan_queries, scan_rows = diff(counters.snapshot(), before)
+
+    before = counters.snapshot()
+    started = time.perf_counter()
+    await drain_outbox()
+    drain_seconds = time.perf_counter() - started
+    drain_queries, drain_rows = diff(counters.snapshot(), before)
+
+    await engine.dispose()
+
+    return {
+        "volume": {"agents": args.agents, "customers": args.customers, "investments": args.investments},
+        "scan": {
+            "wall_seconds": round(scan_seconds, 3),
+            "queries": scan_queries,
+            "rows_fetched": scan_rows,
+        },
+        "delivery": {
+            "wall_seconds": round(drain_seconds, 3),
+            "queries": drain_queries,
+            "rows_fetched": drain_rows,
+            "messages_sent": len(sent),
+            "messages_per_second": round(len(sent) / drain_seconds, 1) if drain_seconds else None,
+        },
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+def print_report(report: dict):
+    volume = report["volume"]
+    print("")
+    print(f"Follow-up benchmark: {volume['agents']} agents, {volume['customers']} customers, {volume['investments']} investments")
+    for phase in ("scan", "delivery"):
+        stats = report[phase]
+        print(f"  {phase:<9} {stats['wall_seconds']:>9.3f}s  {stats['queries']:>7} queries  rows fetched: {stats['rows_fetched']}")
+    delivery = report["delivery"]
+    print(f"  messages  {delivery['messages_sent']} sent, {delivery['messages_per_second']} msg/s")
+    print(f"  peak RSS  {report['peak_rss_mb']} MB (benchmark process, seeding excluded)")
+
+def main():
+    args = parse_args()
+    tmpdir = None
+    db_url = args.db_url
+    if not db_url:
+        tmpdir = tempfile.TemporaryDirectory(prefix="followup_bench_")
+        db_url = f"sqlite+aiosqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    # Seed in a child process so peak RSS reflects the scan, not the data generation
+    print(f"Seeding {args.investments} investments into {db_url.split('://')[0]} ...")
+    started = time.perf_counter()
+    seeder = multiprocessing.get_context("spawn").Process(target=_seed_process, args=(db_url, args))
+    seeder.start()
+    seeder.join()
+    if seeder.exitcode != 0:
+        raise SystemExit("Seeding failed")
+    print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    report = asyncio.run(run_benchmark(db_url, args))
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if tmpdir:
+        tmpdir.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,22 @@
 import asyncio
 from backend.app.core.database import engine
 from sqlalchemy import select
-from backend.app.models.base import Agent
+from backend.app.models.base import Agent, Otp
 
 async def check_otp():
     async with engine.connect() as conn:
-        result = await conn.execute(select(Agent.mobile, Agent.verification_code, Agent.is_verified).where(Agent.mobile == '9310082225'))
+        result = await conn.execute(select(Agent.mobile, Agent.is_verified).where(Agent.mobile == '9310082225'))
         agent = result.fetchone()
         if agent:
             print(f"Mobile: {agent.mobile}")
-            print(f"Stored OTP: {agent.verification_code}")
             print(f"Verified: {agent.is_verified}")
+            # Codes are stored hashed, and only with OTP_STORE=db
+            result = await conn.execute(select(Otp.attempts, Otp.expires_at).where(Otp.mobile == agent.mobile))
+            otp = result.fetchone()
+            if otp:
+                print(f"Pending OTP: expires {otp.expires_at}, {otp.attempts} failed attempts")
+            else:
+                print("No pending OTP in the otp table")
         else:
             print("Agent not found")
 
@@ -0,0 +1,18 @@
+import argparse
+import asyncio
+from backend.app.services.key_rotation import reencrypt_customers
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Re-encrypt customer columns under the active key (ENCRYPTION_ACTIVE_KEY_ID) "
+                    "in the current binary format. Resumes an interrupted run."
+    )
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows per committed batch (default: REENCRYPT_BATCH_SIZE)")
+    parser.add_argument("--pause", type=float, default=None, help="Seconds to sleep between batches (default: REENCRYPT_PAUSE_SECONDS)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved cursor and start from the first row")
+    parser.add_argument("--dry-run", action="store_true", help="Count rows that need rewriting without writing")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(reencrypt_customers(args.batch_size, args.pause, restart=args.restart, dry_run=args.dry_run))
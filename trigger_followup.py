@@ -5,7 +5,8 @@ from backend.app.core.database import SessionLocal
 from backend.app.models.base import Agent, Customer, Investment
 from backend.app.services.followup_engine import check_daily_followups
 from backend.app.schemas.investment import InvestmentStatus, SchemeType
-from backend.app.core.security import encrypt_field
+from backend.app.core.security import encrypt_bytes
+from backend.app.services.followup_schedule import load_schedules
 import uuid
 
 async def setup_test_data():
@@ -32,8 +33,8 @@ async def setup_test_data():
         customer = Customer(
             customer_id=str(uuid.uuid4()),
             agent_id=agent.agent_id,
-            full_name=encrypt_field("Test Customer").encode('utf-8'),
-            mobile=encrypt_field("9998887776").encode('utf-8'),
+            full_name=encrypt_bytes("Test Customer"),
+            mobile=encrypt_bytes("9998887776"),
             consent_flag=True
         )
         db.add(customer)
@@ -48,6 +49,9 @@ async def setup_test_data():
             maturity_date=date.today() + timedelta(days=10), # 10 days from now
             status='ACTIVE'
         )
+        # The scan only picks up investments with a next follow-up date
+        schedules = await load_schedules(db, agent_ids=[agent.agent_id])
+        schedules.resolve(agent.agent_id, inv_f10.scheme_type).schedule_new(inv_f10, date.today())
         db.add(inv_f10)
         await db.commit()
         print("Created Test Investment (Maturity in 10 days)")
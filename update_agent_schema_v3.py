@@ -0,0 +1,23 @@
+import asyncio
+from sqlalchemy import text
+from backend.app.core.database import engine
+from backend.app.models.base import Otp
+
+async def update_schema():
+    print("Updating agent schema (OTP store, unique mobile)...")
+    async with engine.begin() as conn:
+        try:
+            # Signup relies on this instead of a check-then-insert
+            await conn.execute(text("ALTER TABLE agent ADD CONSTRAINT uq_agent_mobile UNIQUE (mobile);"))
+            print("Added uq_agent_mobile.")
+        except Exception as e:
+            print(f"Skipping uq_agent_mobile (merge duplicate agent mobiles first if this failed): {e}")
+
+        # Pending OTPs moved off the agent row (agent.verification_code* are no longer used)
+        await conn.run_sync(Otp.__table__.create, checkfirst=True)
+        print("Ensured otp table.")
+
+    print("Schema update complete.")
+
+if __name__ == "__main__":
+    asyncio.run(update_schema())
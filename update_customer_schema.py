@@ -0,0 +1,103 @@
+import asyncio
+from sqlalchemy import exists, insert, text, update
+from sqlalchemy.future import select
+from backend.app.core.database import engine, SessionLocal
+from backend.app.core.security import decrypt_many, mobile_blind_index, name_search_tokens
+from backend.app.models.base import Customer, CustomerNameToken
+
+BATCH_SIZE = 1000
+
+async def update_schema():
+    print("Updating customer schema...")
+    async with engine.begin() as conn:
+        for column, ddl in [
+            ("mobile_bidx", "ALTER TABLE customer ADD COLUMN mobile_bidx VARCHAR(64) NULL;"),
+            ("ix_customer_agent_mobile_bidx", "CREATE INDEX ix_customer_agent_mobile_bidx ON customer (agent_id, mobile_bidx);"),
+            ("ix_customer_agent_created", "CREATE INDEX ix_customer_agent_created ON customer (agent_id, created_at, customer_id);"),
+            # Resume cursor / progress for the re-encryption job
+            ("job_state.resume_key", "ALTER TABLE job_state ADD COLUMN resume_key VARCHAR(64) NULL;"),
+            ("job_state.progress", "ALTER TABLE job_state ADD COLUMN progress TEXT NULL;"),
+        ]:
+            try:
+                await conn.execute(text(ddl))
+                print(f"Added {column}.")
+            except Exception as e:
+                print(f"Skipping {column}: {e}")
+
+        await conn.run_sync(CustomerNameToken.__table__.create, checkfirst=True)
+        print("Ensured customer_name_token table.")
+
+    print("Schema update complete.")
+
+async def populate_mobile_blind_index():
+    """
+    Fills mobile_bidx for customers that don't have one, decrypting each
+    keyset batch of mobiles once.
+    """
+    print("Populating mobile blind index...")
+    last_id = ""
+    total = 0
+    async with SessionLocal() as db:
+        while True:
+            result = await db.execute(
+                select(Customer.customer_id, Customer.mobile).where(
+                    Customer.customer_id > last_id,
+                    Customer.mobile_bidx.is_(None)
+                ).order_by(Customer.customer_id).limit(BATCH_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].customer_id
+            mobiles = decrypt_many([row.mobile for row in rows])
+            changes = [
+                {"customer_id": row.customer_id, "mobile_bidx": mobile_blind_index(mobile)}
+                for row, mobile in zip(rows, mobiles) if mobile
+            ]
+            if changes:
+                await db.execute(update(Customer), changes)
+            await db.commit()
+            total += len(changes)
+            print(f"  {total} customers indexed")
+    print("Mobile blind index populated.")
+
+async def populate_name_tokens():
+    """
+    Writes search tokens for customers that have none, decrypting each
+    keyset batch of names once.
+    """
+    print("Populating customer name tokens...")
+    last_id = ""
+    total = 0
+    async with SessionLocal() as db:
+        while True:
+            result = await db.execute(
+                select(Customer.customer_id, Customer.agent_id, Customer.full_name).where(
+                    Customer.customer_id > last_id,
+                    ~exists().where(CustomerNameToken.customer_id == Customer.customer_id)
+                ).order_by(Customer.customer_id).limit(BATCH_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].customer_id
+            names = decrypt_many([row.full_name for row in rows])
+            tokens = [
+                {"customer_id": row.customer_id, "agent_id": row.agent_id, "token_hash": token}
+                for row, name in zip(rows, names) if name
+                for token in name_search_tokens(name)
+            ]
+            if tokens:
+                await db.execute(insert(CustomerNameToken), tokens)
+            await db.commit()
+            total += len(rows)
+            print(f"  {total} customers tokenized")
+    print("Customer name tokens populated.")
+
+async def main():
+    await update_schema()
+    await populate_mobile_blind_index()
+    await populate_name_tokens()
+
+if __name__ == "__main__":
+    asyncio.run(main())
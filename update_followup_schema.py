@@ -0,0 +1,149 @@
+import asyncio
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.future import select
+from backend.app.core.database import engine, SessionLocal
+from backend.app.models.base import (
+    Investment, Customer, NotificationOutbox, JobState, SchedulerLease,
+    FollowupSchedule, FollowupScheduleStage
+)
+from backend.app.services.followup_schedule import load_schedules
+
+BATCH_SIZE = 1000
+
+async def update_schema():
+    print("Updating schema for the follow-up engine...")
+    async with engine.begin() as conn:
+        try:
+            # Backfill scans range over maturity dates per stage
+            await conn.execute(text("CREATE INDEX ix_investment_maturity_date ON investment (maturity_date);"))
+            print("Added ix_investment_maturity_date.")
+        except Exception as e:
+            print(f"Skipping ix_investment_maturity_date: {e}")
+
+        try:
+            # Backs the scan's "already sent" anti-join and blocks double inserts
+            await conn.execute(text("ALTER TABLE followup_log ADD CONSTRAINT uq_followup_log_investment_stage UNIQUE (investment_id, stage);"))
+            print("Added uq_followup_log_investment_stage.")
+        except Exception as e:
+            print(f"Skipping uq_followup_log_investment_stage (remove duplicate logs first if this failed): {e}")
+
+        # New tables are created only if missing
+        await conn.run_sync(NotificationOutbox.__table__.create, checkfirst=True)
+        print("Ensured notification_outbox table.")
+
+        try:
+            await conn.execute(text("ALTER TABLE notification_outbox ADD COLUMN digest BOOLEAN DEFAULT FALSE;"))
+            print("Added notification_outbox.digest.")
+        except Exception as e:
+            print(f"Skipping notification_outbox.digest: {e}")
+
+        try:
+            await conn.execute(text("CREATE INDEX ix_notification_outbox_recipient ON notification_outbox (to_number, status);"))
+            print("Added ix_notification_outbox_recipient.")
+        except Exception as e:
+            print(f"Skipping ix_notification_outbox_recipient: {e}")
+
+        try:
+            # In-flight state while a worker sends a claimed batch
+            await conn.execute(text("ALTER TABLE notification_outbox MODIFY COLUMN status ENUM('PENDING','SENDING','SENT','DEAD') DEFAULT 'PENDING';"))
+            print("Added notification_outbox.status SENDING.")
+        except Exception as e:
+            print(f"Skipping notification_outbox.status SENDING: {e}")
+
+        try:
+            # Reminder text names the customer, so it is rendered at send time
+            # instead of stored; clear the copies already queued or sent
+            await conn.execute(text("ALTER TABLE notification_outbox MODIFY COLUMN body TEXT NULL;"))
+            result = await conn.execute(text("UPDATE notification_outbox SET body = NULL WHERE investment_id IS NOT NULL;"))
+            print(f"Cleared {result.rowcount} stored reminder texts.")
+        except Exception as e:
+            print(f"Skipping notification_outbox.body cleanup: {e}")
+
+        await conn.run_sync(JobState.__table__.create, checkfirst=True)
+        print("Ensured job_state table.")
+
+        await conn.run_sync(SchedulerLease.__table__.create, checkfirst=True)
+        print("Ensured scheduler_lease table.")
+
+        for column, ddl in [
+            ("next_stage", "ALTER TABLE investment ADD COLUMN next_stage VARCHAR(10) NULL;"),
+            ("next_followup_date", "ALTER TABLE investment ADD COLUMN next_followup_date DATE NULL;"),
+            ("ix_investment_next_followup_date", "CREATE INDEX ix_investment_next_followup_date ON investment (next_followup_date);"),
+        ]:
+            try:
+                await conn.execute(text(ddl))
+                print(f"Added {column}.")
+            except Exception as e:
+                print(f"Skipping {column}: {e}")
+
+        # Stage codes come from configurable schedules, so the fixed ENUMs become strings
+        for table, column in [
+            ("investment", "current_stage"),
+            ("investment", "next_stage"),
+            ("followup_log", "stage"),
+            ("notification_outbox", "stage"),
+        ]:
+            try:
+                await conn.execute(text(f"ALTER TABLE {table} MODIFY COLUMN {column} VARCHAR(10) NULL;"))
+                print(f"Converted {table}.{column} to VARCHAR(10).")
+            except Exception as e:
+                print(f"Skipping {table}.{column}: {e}")
+
+        await conn.run_sync(FollowupSchedule.__table__.create, checkfirst=True)
+        await conn.run_sync(FollowupScheduleStage.__table__.create, checkfirst=True)
+        print("Ensured followup_schedule tables.")
+
+        # One schedule per owner, including global / per-scheme ones (NULL owners)
+        for column, ddl in [
+            ("followup_schedule.owner_key", "ALTER TABLE followup_schedule ADD COLUMN owner_key VARCHAR(50) NULL;"),
+            ("owner_key values", "UPDATE followup_schedule SET owner_key = CONCAT(COALESCE(agent_id, '*'), ':', COALESCE(scheme_type, '*')) WHERE owner_key IS NULL;"),
+            ("owner_key NOT NULL", "ALTER TABLE followup_schedule MODIFY COLUMN owner_key VARCHAR(50) NOT NULL;"),
+            ("uq_followup_schedule_owner_key (remove duplicate schedules first if this failed)", "ALTER TABLE followup_schedule ADD CONSTRAINT uq_followup_schedule_owner_key UNIQUE (owner_key);"),
+        ]:
+            try:
+                await conn.execute(text(ddl))
+                print(f"Added {column}.")
+            except Exception as e:
+                print(f"Skipping {column}: {e}")
+
+    print("Schema update complete.")
+
+async def populate_next_followups():
+    """
+    Computes next_stage/next_followup_date for investments that don't have one,
+    in keyset batches so the table is never locked for long.
+    """
+    print("Populating next follow-up dates...")
+    today = date.today()
+    last_id = ""
+    total = 0
+    async with SessionLocal() as db:
+        schedules = await load_schedules(db)
+        while True:
+            result = await db.execute(
+                select(Investment, Customer.agent_id).join(
+                    Customer, Investment.customer_id == Customer.customer_id
+                ).where(
+                    Investment.investment_id > last_id,
+                    Investment.next_followup_date.is_(None)
+                ).order_by(Investment.investment_id).limit(BATCH_SIZE)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1][0].investment_id
+            for investment, agent_id in rows:
+                schedules.resolve(agent_id, investment.scheme_type).schedule_new(investment, today)
+            await db.commit()
+            db.expunge_all()
+            total += len(rows)
+            print(f"  {total} investments scheduled")
+    print("Next follow-up dates populated.")
+
+async def main():
+    await update_schema()
+    await populate_next_followups()
+
+if __name__ == "__main__":
+    asyncio.run(main())